@@ -0,0 +1,143 @@
+import asyncio
+import json
+import random
+import re
+import time
+from typing import Dict, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+# Every fact-bearing message produced by the benchmark follows one of these
+# templates, which lets the fake model "extract" them without an LLM.
+FACT_TEMPLATES = {
+    "pet": "I have a pet {value}",
+    "location": "I live in {value}",
+    "job": "I work as a {value}",
+    "hobby": "I love {value}",
+    "food_preference": "I like eating {value}",
+}
+FACT_VALUES = {
+    "pet": ["dog named Charlie", "horse named Luna", "cat named Moon", "parrot"],
+    "location": ["New York City", "Paris", "San Francisco", "Tokyo", "Berlin"],
+    "job": ["software engineer", "teacher", "nurse", "designer"],
+    "hobby": ["basketball", "guitar", "hiking", "chess", "painting"],
+    "food_preference": ["sushi", "vegetarian food", "pasta", "tacos"],
+}
+SMALL_TALK = ["thanks!", "ok", "haha", "👍", "sounds good", "Can you help me?"]
+
+STAGES = (
+    ("maintains a memory", "patch"),
+    ("finds relevant keys", "find_key"),
+    ("resolves conflicts", "resolve_conflict"),
+    ("personal information from messages", "extract"),
+    ("personal information from conversations", "extract_batch"),
+    ("actionable insights (beliefs)", "beliefs"),
+    ("filters relevant information", "filter_context"),
+    ("condenses oversized entries", "summarize"),
+)
+
+
+def make_message(rng: random.Random, fact_ratio: float = 0.5) -> str:
+    if rng.random() >= fact_ratio:
+        return rng.choice(SMALL_TALK)
+    key = rng.choice(list(FACT_TEMPLATES))
+    return FACT_TEMPLATES[key].format(value=rng.choice(FACT_VALUES[key]))
+
+
+def extract_facts(text: str) -> Dict[str, str]:
+    facts = {}
+    for key, template in FACT_TEMPLATES.items():
+        pattern = re.escape(template).replace(re.escape("{value}"), r"(.+?)[.!]?$")
+        for line in text.splitlines():
+            line = line.split(": ", 1)[-1].strip()
+            match = re.match(pattern, line)
+            if match:
+                facts[key] = match.group(1)
+    return facts
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Deterministic stand-in for a chat model, for offline benchmarks.
+
+    Recognizes the memory prompts by their system instructions, answers them
+    from the fact templates above, and sleeps for ``latency`` (+/- ``jitter``)
+    seconds per call to emulate a remote provider.
+    """
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    seed: int = 0
+    temperature: Optional[float] = 0
+    calls: Dict[str, int] = {}
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def _generate(
+        self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs
+    ) -> ChatResult:
+        time.sleep(self._delay())
+        return self._respond(messages)
+
+    async def _agenerate(
+        self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs
+    ) -> ChatResult:
+        await asyncio.sleep(self._delay())
+        return self._respond(messages)
+
+    def _delay(self) -> float:
+        if not self.jitter:
+            return self.latency
+        rng = random.Random(self.seed + self.total_calls)
+        return max(0.0, self.latency + rng.uniform(-self.jitter, self.jitter))
+
+    def _respond(self, messages: List[BaseMessage]) -> ChatResult:
+        prompt = "\n".join(str(message.content) for message in messages)
+        stage = next((stage for marker, stage in STAGES if marker in prompt), "other")
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+
+        human = str(messages[-1].content)
+        if stage == "extract":
+            content = json.dumps(extract_facts(human.split("Message:", 1)[-1]))
+        elif stage == "extract_batch":
+            content = json.dumps(extract_facts(human.split("Conversation:", 1)[-1]))
+        elif stage == "patch":
+            facts = extract_facts(human.rsplit("\n\n", 1)[-1])
+            content = json.dumps(
+                {
+                    "operations": [
+                        {"op": "replace", "key": key, "value": value}
+                        for key, value in facts.items()
+                    ]
+                }
+            )
+        elif stage == "find_key":
+            content = "None"
+        elif stage == "resolve_conflict":
+            content = re.search(r"New value: (.*)", human).group(1).strip()
+        elif stage == "beliefs":
+            content = "- Suggest activities that match the user's hobbies"
+        elif stage == "summarize":
+            value = json.loads(human.split("Value:", 1)[-1])
+            content = str(value[-1] if isinstance(value, list) else value)[:100]
+        elif stage == "filter_context":
+            content = human.split("Message:", 1)[0].strip()
+        else:
+            content = "None"
+
+        message = AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": len(prompt) // 4,
+                "output_tokens": len(content) // 4,
+                "total_tokens": (len(prompt) + len(content)) // 4,
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
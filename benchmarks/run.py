@@ -0,0 +1,290 @@
+"""Offline performance benchmarks for the memory managers.
+
+Runs the full update pipeline against a scripted, latency-injecting fake LLM,
+so no API key or network access is needed, and prints the results as JSON::
+
+    python -m benchmarks.run --users 1000 10000 --storage log sqlite --output bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from memory import MemoryManager
+from memory.memory import BaseAsyncMemory
+from memory.storage import IndexedSnapshotStorage, JSONFileStorage, SQLiteStorage
+
+from .fake_llm import ScriptedChatModel, make_message
+
+MESSAGE_MIXES = {"facts": 1.0, "mixed": 0.5, "chatty": 0.1}
+
+
+def bytes_written() -> Optional[int]:
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[int(q) - 1]
+
+
+def make_storage(kind: str, directory: str):
+    if kind == "sqlite":
+        return SQLiteStorage(os.path.join(directory, "memory.db"))
+    if kind == "indexed":
+        return IndexedSnapshotStorage(os.path.join(directory, "memory.idx"))
+    return JSONFileStorage(os.path.join(directory, "memory.json"), persistence=kind)
+
+
+def make_workload(users: int, messages_per_user: int, mix: str, seed: int):
+    rng = random.Random(seed)
+    workload = [
+        (f"user-{user}", make_message(rng, MESSAGE_MIXES[mix]))
+        for _ in range(messages_per_user)
+        for user in range(users)
+    ]
+    return workload
+
+
+def summarize(
+    scenario: Dict[str, Any],
+    latencies: List[float],
+    elapsed: float,
+    llm: ScriptedChatModel,
+    written: Optional[int],
+    rss_before: float,
+) -> Dict[str, Any]:
+    messages = len(latencies)
+    return {
+        **scenario,
+        "messages": messages,
+        "elapsed_s": round(elapsed, 4),
+        "throughput_msg_s": round(messages / elapsed, 2) if elapsed else None,
+        "latency_p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "latency_p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "llm_calls_per_message": round(llm.total_calls / messages, 3),
+        "llm_calls_by_stage": dict(llm.calls),
+        "bytes_written_per_update": (
+            round(written / messages, 1) if written is not None else None
+        ),
+        "rss_mb": round(rss_mb(), 1),
+        "rss_growth_mb": round(rss_mb() - rss_before, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+async def run_async_scenario(
+    users: int,
+    messages_per_user: int = 1,
+    mix: str = "mixed",
+    storage: str = "snapshot",
+    concurrency: int = 64,
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    seed: int = 0,
+    memory_options: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    memory_options = memory_options or {}
+    scenario = {
+        "api": "async",
+        "users": users,
+        "messages_per_user": messages_per_user,
+        "mix": mix,
+        "storage": storage,
+        "concurrency": concurrency,
+        "latency_s": latency,
+        "memory_options": {key: repr(value) for key, value in memory_options.items()},
+    }
+    workload = make_workload(users, messages_per_user, mix, seed)
+    llm = ScriptedChatModel(latency=latency, jitter=jitter, seed=seed)
+
+    with tempfile.TemporaryDirectory() as directory:
+        memory = BaseAsyncMemory(
+            llm=llm,
+            business_description="A personal AI assistant",
+            include_beliefs=True,
+            storage=make_storage(storage, directory),
+            **memory_options,
+        )
+        queue = asyncio.Queue()
+        for item in workload:
+            queue.put_nowait(item)
+        latencies = []
+
+        async def worker():
+            while not queue.empty():
+                user_id, message = queue.get_nowait()
+                start = time.perf_counter()
+                await memory.update_memory(user_id, message)
+                latencies.append(time.perf_counter() - start)
+
+        rss_before = rss_mb()
+        written_before = bytes_written()
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        await memory.close()
+        elapsed = time.perf_counter() - start
+        written_after = bytes_written()
+
+    written = written_after - written_before if written_before is not None else None
+    return summarize(scenario, latencies, elapsed, llm, written, rss_before)
+
+
+def run_sync_scenario(
+    users: int,
+    messages_per_user: int = 1,
+    mix: str = "mixed",
+    storage: str = "snapshot",
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    seed: int = 0,
+    memory_options: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    memory_options = memory_options or {}
+    scenario = {
+        "api": "sync",
+        "users": users,
+        "messages_per_user": messages_per_user,
+        "mix": mix,
+        "storage": storage,
+        "concurrency": 1,
+        "latency_s": latency,
+        "memory_options": {key: repr(value) for key, value in memory_options.items()},
+    }
+    workload = make_workload(users, messages_per_user, mix, seed)
+    llm = ScriptedChatModel(latency=latency, jitter=jitter, seed=seed)
+
+    with tempfile.TemporaryDirectory() as directory:
+        memory_manager = MemoryManager(
+            llm=llm,
+            memory_options={
+                "storage": make_storage(storage, directory),
+                **memory_options,
+            },
+        )
+        latencies = []
+        rss_before = rss_mb()
+        written_before = bytes_written()
+        start = time.perf_counter()
+        for user_id, message in workload:
+            message_start = time.perf_counter()
+            memory_manager.update_memory(user_id, message)
+            latencies.append(time.perf_counter() - message_start)
+        memory_manager.close()
+        elapsed = time.perf_counter() - start
+        written_after = bytes_written()
+
+    written = written_after - written_before if written_before is not None else None
+    return summarize(scenario, latencies, elapsed, llm, written, rss_before)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, nargs="+", default=[1000])
+    parser.add_argument("--messages-per-user", type=int, default=1)
+    parser.add_argument(
+        "--mix", nargs="+", choices=sorted(MESSAGE_MIXES), default=["mixed"]
+    )
+    parser.add_argument(
+        "--storage",
+        nargs="+",
+        choices=["snapshot", "log", "sqlite", "indexed"],
+        default=["log"],
+    )
+    parser.add_argument(
+        "--api", nargs="+", choices=["async", "sync"], default=["async"]
+    )
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds per LLM call"
+    )
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--memory-options",
+        type=json.loads,
+        default={},
+        help='JSON object forwarded to BaseAsyncMemory, e.g. \'{"update_strategy": "consolidated"}\'',
+    )
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    results = []
+    for api in args.api:
+        for storage in args.storage:
+            for mix in args.mix:
+                for users in args.users:
+                    kwargs = dict(
+                        users=users,
+                        messages_per_user=args.messages_per_user,
+                        mix=mix,
+                        storage=storage,
+                        latency=args.latency,
+                        jitter=args.jitter,
+                        seed=args.seed,
+                        memory_options=args.memory_options,
+                    )
+                    if api == "async":
+                        result = asyncio.run(
+                            run_async_scenario(concurrency=args.concurrency, **kwargs)
+                        )
+                    else:
+                        result = run_sync_scenario(**kwargs)
+                    results.append(result)
+                    print(
+                        f"{api}/{storage}/{mix}/{users} users: "
+                        f"{result['throughput_msg_s']} msg/s",
+                        file=sys.stderr,
+                    )
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
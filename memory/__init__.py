@@ -1 +1,4 @@
+from .bulk import BulkUpdateResult
+from .changes import MemoryChange
 from .memory import AsyncMemoryManager, MemoryManager
+from .ratelimit import TokenBucket
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class BeliefScheduler:
+    """Debounces belief regeneration per user off the request path.
+
+    Every memory change calls ``schedule``. Regeneration for a user runs once
+    no change has arrived for ``quiet_period`` seconds, or immediately once
+    ``max_pending_changes`` changes have piled up, whichever comes first.
+    A failed regeneration is logged and counted in ``failures``; the user
+    keeps their last beliefs until a later change schedules another run.
+    """
+
+    def __init__(
+        self,
+        regenerate: Callable[[str], Awaitable[None]],
+        quiet_period: float = 5.0,
+        max_pending_changes: int = 10,
+    ):
+        self.regenerate = regenerate
+        self.quiet_period = quiet_period
+        self.max_pending_changes = max_pending_changes
+        self.runs = 0
+        self.failures = 0
+        self._pending: Dict[str, int] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+
+    def schedule(self, user_id: str):
+        self._pending[user_id] = self._pending.get(user_id, 0) + 1
+        if self._pending[user_id] >= self.max_pending_changes:
+            self._start(user_id)
+        else:
+            self._set_timer(user_id)
+
+    def is_pending(self, user_id: str) -> bool:
+        return user_id in self._pending or user_id in self._running
+
+    async def wait(self, user_id: str):
+        while self.is_pending(user_id):
+            if user_id not in self._running:
+                self._start(user_id)
+            await asyncio.shield(self._running[user_id])
+
+    async def flush(self):
+        while self._pending or self._running:
+            for user_id in list(self._pending):
+                self._start(user_id)
+            await asyncio.gather(*self._running.values())
+
+    def _set_timer(self, user_id: str):
+        timer = self._timers.pop(user_id, None)
+        if timer:
+            timer.cancel()
+        self._timers[user_id] = asyncio.get_running_loop().call_later(
+            self.quiet_period, self._start, user_id
+        )
+
+    def _start(self, user_id: str):
+        timer = self._timers.pop(user_id, None)
+        if timer:
+            timer.cancel()
+        if user_id in self._running:
+            # Changes that land mid-run are picked up by a follow-up run.
+            return
+
+        self._pending.pop(user_id, None)
+        task = asyncio.create_task(self._run(user_id))
+        self._running[user_id] = task
+
+    async def _run(self, user_id: str):
+        try:
+            self.runs += 1
+            await self.regenerate(user_id)
+        except Exception:
+            self.failures += 1
+            logger.exception("Belief regeneration failed for user %s", user_id)
+        finally:
+            del self._running[user_id]
+            if user_id in self._pending:
+                self._set_timer(user_id)
@@ -0,0 +1,186 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+from dataclasses import dataclass
+from typing import (
+    AsyncIterable,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+import aiofiles
+from langchain_core.messages import BaseMessage
+
+from .ratelimit import TokenBucket, run_rate_limiter
+
+Conversation = Union[str, List[BaseMessage], List[Dict[str, str]]]
+Conversations = Union[
+    Iterable[Tuple[str, Conversation]], AsyncIterable[Tuple[str, Conversation]]
+]
+
+
+@dataclass
+class BulkUpdateResult:
+    user_id: str
+    memory: Optional[Dict] = None
+    error: Optional[BaseException] = None
+    attempts: int = 0
+    skipped: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class BulkIngestor:
+    """Feeds many (user_id, conversation) pairs through a memory object.
+
+    Conversations are processed by ``max_concurrency`` workers, failed ones are
+    retried with exponential backoff and jitter, and results are streamed as
+    they complete. With ``checkpoint_file`` every successful conversation is
+    recorded once its memory has been written to storage, so a restarted run
+    skips work that already finished. ``rate_limiter`` throttles the LLM calls
+    made for this run, in addition to the memory's own limiter.
+    """
+
+    def __init__(
+        self,
+        memory,
+        max_concurrency: int = 16,
+        max_retries: int = 3,
+        backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        checkpoint_file: Optional[str] = None,
+        rate_limiter: Optional[TokenBucket] = None,
+    ):
+        self.memory = memory
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.checkpoint_file = checkpoint_file
+        self.rate_limiter = rate_limiter
+        self._checkpoint_lock = asyncio.Lock()
+        self._pending_checkpoints: List[str] = []
+
+    async def run(
+        self, conversations: Conversations
+    ) -> AsyncIterator[BulkUpdateResult]:
+        completed = await self._load_checkpoint()
+        conversations = self._aiter(conversations)
+        iterator_lock = asyncio.Lock()
+        results = asyncio.Queue(maxsize=self.max_concurrency * 2)
+
+        async def worker():
+            # Each worker runs in its own context, so the limiter applies to
+            # this run's LLM calls only, not to other traffic on the memory.
+            run_rate_limiter.set(self.rate_limiter)
+            while True:
+                async with iterator_lock:
+                    try:
+                        user_id, conversation = await conversations.__anext__()
+                    except StopAsyncIteration:
+                        return
+
+                key = self._checkpoint_key(user_id, conversation)
+                if key in completed:
+                    await results.put(BulkUpdateResult(user_id, skipped=True))
+                    continue
+
+                result = await self._process(user_id, conversation)
+                if result.ok:
+                    await self._checkpoint(key)
+                await results.put(result)
+
+        workers = asyncio.gather(
+            *(asyncio.create_task(worker()) for _ in range(self.max_concurrency))
+        )
+        try:
+            while not (workers.done() and results.empty()):
+                next_result = asyncio.ensure_future(results.get())
+                await asyncio.wait(
+                    {next_result, workers}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if next_result.done():
+                    yield next_result.result()
+                else:
+                    next_result.cancel()
+            # Surface errors raised by the input iterator itself.
+            workers.result()
+        finally:
+            if not workers.done():
+                workers.cancel()
+                await asyncio.gather(workers, return_exceptions=True)
+
+    async def _process(
+        self, user_id: str, conversation: Conversation
+    ) -> BulkUpdateResult:
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                if isinstance(conversation, str):
+                    memory = await self.memory.update_memory(user_id, conversation)
+                else:
+                    memory = await self.memory.batch_update_memory(
+                        user_id, conversation
+                    )
+                return BulkUpdateResult(user_id, memory=memory, attempts=attempt)
+            except Exception as e:
+                if attempt > self.max_retries:
+                    return BulkUpdateResult(user_id, error=e, attempts=attempt)
+                delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+
+    async def _load_checkpoint(self) -> Set[str]:
+        if not self.checkpoint_file or not os.path.exists(self.checkpoint_file):
+            return set()
+        async with aiofiles.open(self.checkpoint_file, "r") as f:
+            content = await f.read()
+        return set(content.split())
+
+    async def _checkpoint(self, key: str):
+        if not self.checkpoint_file:
+            return
+        self._pending_checkpoints.append(key)
+        async with self._checkpoint_lock:
+            keys, self._pending_checkpoints = self._pending_checkpoints, []
+            if not keys:
+                return
+            # With group commit (``flush_interval``) an update may still be
+            # buffered; it has to be durable before it is skipped on restart.
+            # Keys that arrive during the flush are written by the next round.
+            await self.memory.flush()
+            async with aiofiles.open(self.checkpoint_file, "a") as f:
+                await f.write("".join(f"{key}\n" for key in keys))
+
+    @staticmethod
+    def _checkpoint_key(user_id: str, conversation: Conversation) -> str:
+        if not isinstance(conversation, str):
+            conversation = [
+                (
+                    (message.type, message.content)
+                    if isinstance(message, BaseMessage)
+                    else (message["role"], message["content"])
+                )
+                for message in conversation
+            ]
+        payload = json.dumps([user_id, conversation], default=str)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    @staticmethod
+    async def _aiter(conversations: Conversations) -> AsyncIterator:
+        if hasattr(conversations, "__aiter__"):
+            async for item in conversations:
+                yield item
+        else:
+            for item in conversations:
+                yield item
@@ -0,0 +1,119 @@
+import json
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+
+class LRUCache:
+    """Least-recently-used cache bounded by entry count and/or approximate bytes.
+
+    Entries can be marked dirty; ``put`` returns the dirty entries it had to
+    evict so the caller can write them back before they are lost.
+    """
+
+    def __init__(
+        self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._dirty = set()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries != 0 and self.max_bytes != 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        self.misses += 1
+        return None
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        return self._entries.get(key)
+
+    def put(
+        self, key: Hashable, value: Any, dirty: bool = False
+    ) -> List[Tuple[Hashable, Any]]:
+        if not self.enabled:
+            return [(key, value)] if dirty else []
+
+        self._discard(key)
+        self._entries[key] = value
+        if self.max_bytes is not None:
+            self._sizes[key] = self._size_of(value)
+            self.total_bytes += self._sizes[key]
+        if dirty:
+            self._dirty.add(key)
+        return self._evict(protect=key)
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        value = self._entries.get(key)
+        self._discard(key)
+        return value
+
+    def mark_clean(self, key: Hashable):
+        self._dirty.discard(key)
+
+    def is_dirty(self, key: Hashable) -> bool:
+        return key in self._dirty
+
+    def dirty_items(self) -> List[Tuple[Hashable, Any]]:
+        return [(key, self._entries[key]) for key in self._dirty]
+
+    def clear(self):
+        self._entries.clear()
+        self._sizes.clear()
+        self._dirty.clear()
+        self.total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _evict(self, protect: Hashable) -> List[Tuple[Hashable, Any]]:
+        evicted = []
+        while self._over_capacity() and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            if key == protect:
+                self._entries.move_to_end(key)
+                continue
+            dirty = key in self._dirty
+            value = self.pop(key)
+            self.evictions += 1
+            if dirty:
+                evicted.append((key, value))
+        return evicted
+
+    def _over_capacity(self) -> bool:
+        if self.max_entries is not None and len(self._entries) > self.max_entries:
+            return True
+        return self.max_bytes is not None and self.total_bytes > self.max_bytes
+
+    def _discard(self, key: Hashable):
+        self._entries.pop(key, None)
+        self.total_bytes -= self._sizes.pop(key, 0)
+        self._dirty.discard(key)
+
+    @staticmethod
+    def _size_of(value: Any) -> int:
+        return len(json.dumps(value, default=str))
@@ -0,0 +1,123 @@
+import asyncio
+import inspect
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class MemoryChange:
+    user_id: str
+    kind: str  # "update" or "delete"
+    changed_keys: List[str] = field(default_factory=list)
+    beliefs: Optional[str] = None
+    timestamp: float = field(default_factory=time.time)
+
+
+class Subscription:
+    """Async iterator over the changes published after it was opened.
+
+    Changes are buffered in a queue of ``max_queue`` entries; a subscriber
+    that falls behind loses the oldest changes rather than blocking updates,
+    and ``dropped`` counts how many it missed.
+    """
+
+    _CLOSED = object()
+
+    def __init__(
+        self, feed: "ChangeFeed", user_ids: Optional[Set[str]], max_queue: int
+    ):
+        self.dropped = 0
+        self._feed = feed
+        self._user_ids = user_ids
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._closed = False
+
+    def _offer(self, item: Any):
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(item)
+
+    def accepts(self, change: MemoryChange) -> bool:
+        return self._user_ids is None or change.user_id in self._user_ids
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._feed._subscriptions.discard(self)
+            self._offer(self._CLOSED)
+
+    def __aiter__(self) -> "Subscription":
+        return self
+
+    async def __anext__(self) -> MemoryChange:
+        change = await self._queue.get()
+        if change is self._CLOSED:
+            raise StopAsyncIteration
+        return change
+
+    async def __aenter__(self) -> "Subscription":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+
+class ChangeFeed:
+    """Fans memory changes out to subscriptions and listener callbacks.
+
+    Listeners may be plain functions or coroutine functions; they run on the
+    memory's event loop, and a failing listener never fails the update.
+    """
+
+    def __init__(self):
+        self._subscriptions: Set[Subscription] = set()
+        self._listeners: List[Callable[[MemoryChange], Any]] = []
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def active(self) -> bool:
+        return bool(self._subscriptions or self._listeners)
+
+    def subscribe(
+        self, user_ids: Optional[Iterable[str]] = None, max_queue: int = 1000
+    ) -> Subscription:
+        subscription = Subscription(
+            self, set(user_ids) if user_ids is not None else None, max_queue
+        )
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def add_listener(self, listener: Callable[[MemoryChange], Any]):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[MemoryChange], Any]):
+        self._listeners.remove(listener)
+
+    def publish(self, change: MemoryChange):
+        for subscription in list(self._subscriptions):
+            if subscription.accepts(change):
+                subscription._offer(change)
+        for listener in self._listeners:
+            try:
+                result = listener(change)
+            except Exception:
+                logger.exception("Memory change listener %r failed", listener)
+                continue
+            if inspect.isawaitable(result):
+                task = asyncio.ensure_future(result)
+                self._tasks.add(task)
+                task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Memory change listener failed", exc_info=task.exception())
+
+    async def drain(self):
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,69 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class MemoryCompactor:
+    """Policy for shrinking user records that have grown past a size threshold.
+
+    List values are deduplicated (keeping the latest occurrence), items older
+    than ``max_age`` seconds are evicted and at most ``max_list_items`` of the
+    newest items are kept; the newest item always survives. With
+    ``summarize`` the memory additionally asks the LLM to condense values that
+    still serialize to more than ``max_value_bytes``.
+    """
+
+    def __init__(
+        self,
+        threshold_bytes: int = 16_384,
+        max_list_items: Optional[int] = None,
+        max_age: Optional[float] = None,
+        summarize: bool = False,
+        max_value_bytes: int = 1024,
+    ):
+        self.threshold_bytes = threshold_bytes
+        self.max_list_items = max_list_items
+        self.max_age = max_age
+        self.summarize = summarize
+        self.max_value_bytes = max_value_bytes
+        self.stats = {
+            "runs": 0,
+            "bytes_reclaimed": 0,
+            "items_deduplicated": 0,
+            "items_evicted": 0,
+            "keys_summarized": 0,
+        }
+
+    @staticmethod
+    def size_of(value: Any) -> int:
+        return len(json.dumps(value, default=str).encode())
+
+    def needs_compaction(self, user_memory: Dict) -> bool:
+        return self.size_of(user_memory) > self.threshold_bytes
+
+    def oversized(self, value: Any) -> bool:
+        return self.summarize and self.size_of(value) > self.max_value_bytes
+
+    @staticmethod
+    def _identity(item: Any) -> str:
+        if isinstance(item, str):
+            return item.strip().casefold()
+        return json.dumps(item, sort_keys=True, default=str)
+
+    def compact_list(
+        self, values: List[Any], added_at: List[float], now: float
+    ) -> Tuple[List[Any], List[float]]:
+        """Return the surviving items of ``values`` with their timestamps."""
+        latest = {}
+        for position, item in enumerate(values):
+            latest[self._identity(item)] = position
+        kept = sorted(latest.values())
+        self.stats["items_deduplicated"] += len(values) - len(kept)
+
+        before_eviction = len(kept)
+        if self.max_age is not None:
+            kept = [p for p in kept if now - added_at[p] <= self.max_age] or kept[-1:]
+        if self.max_list_items is not None:
+            kept = kept[-max(1, self.max_list_items) :]
+        self.stats["items_evicted"] += before_eviction - len(kept)
+
+        return [values[p] for p in kept], [added_at[p] for p in kept]
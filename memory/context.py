@@ -0,0 +1,67 @@
+from typing import Any, Dict, List, Optional
+
+from .retrieval import CHARS_PER_TOKEN, estimate_tokens
+
+CONTEXT_HEADER = "User Memory:\n"
+
+
+def rank_keys(
+    user_memory: Dict[str, Any],
+    updated_at: Dict[str, str],
+    priorities: Optional[Dict[str, float]] = None,
+) -> List[str]:
+    """Order keys by priority, then by how recently they were updated."""
+    priorities = priorities or {}
+    keys = list(user_memory)
+    # Two stable sorts: recency first, then priority, so recency breaks ties.
+    keys.sort(key=lambda key: updated_at.get(key, ""), reverse=True)
+    keys.sort(key=lambda key: priorities.get(key, 0), reverse=True)
+    return keys
+
+
+def fit_entry(key: str, value: Any, max_tokens: int) -> Optional[str]:
+    """Render ``key: value`` within ``max_tokens``, shortening it if needed.
+
+    Lists keep their most recent (last) items and note how many were dropped,
+    cutting off the newest item if even it does not fit on its own; other
+    values are cut off. Returns None if not even a stub fits.
+    """
+    entry = f"{key}: {value}"
+    if estimate_tokens(entry) <= max_tokens:
+        return entry
+
+    if isinstance(value, list):
+        for kept in range(len(value) - 1, 0, -1):
+            entry = f"{key}: {value[-kept:]} (+{len(value) - kept} earlier)"
+            if estimate_tokens(entry) <= max_tokens:
+                return entry
+        if not value:
+            return None
+        earlier = f" (+{len(value) - 1} earlier)" if len(value) > 1 else ""
+        max_chars = (max_tokens - 1) * CHARS_PER_TOKEN - len(f"{key}: ['...']{earlier}")
+        if max_chars < 8:
+            return None
+        return f"{key}: ['{str(value[-1])[:max_chars]}...']{earlier}"
+
+    max_chars = (max_tokens - 1) * CHARS_PER_TOKEN - len(key) - len(": ...")
+    if max_chars < 8:
+        return None
+    return f"{key}: {str(value)[:max_chars]}..."
+
+
+def render_budgeted_context(
+    user_memory: Dict[str, Any],
+    updated_at: Dict[str, str],
+    max_tokens: int,
+    priorities: Optional[Dict[str, float]] = None,
+) -> str:
+    """Render the most important entries of ``user_memory`` within a budget."""
+    lines = []
+    budget = max_tokens - estimate_tokens(CONTEXT_HEADER)
+    for key in rank_keys(user_memory, updated_at, priorities):
+        entry = fit_entry(key, user_memory[key], budget)
+        if entry is None:
+            continue
+        lines.append(entry)
+        budget -= estimate_tokens(entry)
+    return CONTEXT_HEADER + "".join(f"{line}\n" for line in lines)
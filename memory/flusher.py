@@ -0,0 +1,102 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class GroupCommitFlusher:
+    """Coalesces saves into periodic group commits.
+
+    ``mark`` records the latest version of a user's record as dirty. Dirty
+    records are handed to ``write`` together, in one call, ``flush_interval``
+    seconds after the first of them was marked, or as soon as ``max_dirty``
+    users are dirty, whichever comes first. A user saved several times between
+    flushes is written once. A failed flush keeps its records dirty and is
+    retried on the next interval.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[Dict[str, Dict]], Awaitable[None]],
+        flush_interval: float = 1.0,
+        max_dirty: int = 100,
+    ):
+        self.write = write
+        self.flush_interval = flush_interval
+        self.max_dirty = max_dirty
+        self.stats = {"flushes": 0, "records_flushed": 0, "saves_coalesced": 0}
+        self._dirty: Dict[str, Dict] = {}
+        # The batch being written, still served by ``get`` until it has landed.
+        self._writing: Dict[str, Dict] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushing: Optional[asyncio.Task] = None
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._dirty or user_id in self._writing
+
+    def get(self, user_id: str) -> Optional[Dict]:
+        return self._dirty.get(user_id, self._writing.get(user_id))
+
+    def mark(self, user_id: str, record: Dict):
+        if user_id in self._dirty:
+            self.stats["saves_coalesced"] += 1
+        self._dirty[user_id] = record
+        if len(self._dirty) >= self.max_dirty:
+            self._start()
+        elif self._timer is None and self._flushing is None:
+            self._set_timer()
+
+    def discard(self, user_id: str):
+        self._dirty.pop(user_id, None)
+
+    async def flush(self):
+        """Write every dirty record and return once they are durable."""
+        while self._dirty or self._flushing:
+            if self._flushing is None:
+                self._start()
+            await asyncio.shield(self._flushing)
+
+    async def wait_idle(self):
+        """Wait for an in-flight flush, if any, without starting a new one."""
+        if self._flushing:
+            await asyncio.wait([self._flushing])
+
+    def _set_timer(self):
+        self._timer = asyncio.get_running_loop().call_later(
+            self.flush_interval, self._start
+        )
+
+    def _start(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        if self._flushing is None:
+            # Records marked while a flush runs are picked up by its next round.
+            self._flushing = asyncio.create_task(self._run())
+            self._flushing.add_done_callback(self._flush_done)
+
+    async def _run(self):
+        try:
+            while self._dirty:
+                batch = self._writing = self._dirty
+                self._dirty = {}
+                try:
+                    await self.write(batch)
+                except BaseException:
+                    for user_id, record in batch.items():
+                        self._dirty.setdefault(user_id, record)
+                    raise
+                finally:
+                    self._writing = {}
+                self.stats["flushes"] += 1
+                self.stats["records_flushed"] += len(batch)
+        finally:
+            self._flushing = None
+            if self._dirty and self._timer is None:
+                self._set_timer()
+
+    @staticmethod
+    def _flush_done(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Memory flush failed", exc_info=task.exception())
@@ -0,0 +1,284 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from .cache import LRUCache
+
+# A point in time: a datetime, an ISO string or epoch seconds. Version numbers
+# are passed separately, since an int would be ambiguous.
+AsOf = Union[datetime, str, int, float]
+
+
+class BaseHistory(ABC):
+    """Version history of user records, kept next to the primary storage.
+
+    Every saved change is recorded as a delta against the previous version
+    (the keys that were set and the keys that were removed), and every
+    ``snapshot_interval`` versions as a full snapshot, so reconstructing a
+    version never replays more than ``snapshot_interval`` deltas.
+    """
+
+    def __init__(self, snapshot_interval: int = 20):
+        self.snapshot_interval = snapshot_interval
+        # user_id -> (latest version, deltas written since the last snapshot)
+        self._heads = LRUCache(max_entries=100_000)
+
+    @abstractmethod
+    async def _append(self, user_id: str, entry: Dict):
+        pass
+
+    @abstractmethod
+    async def _entries(self, user_id: str) -> List[Dict]:
+        pass
+
+    async def close(self):
+        pass
+
+    async def _head(self, user_id: str) -> Tuple[int, int]:
+        head = self._heads.get(user_id)
+        if head is None:
+            version, since_snapshot = 0, 0
+            for entry in await self._entries(user_id):
+                version = entry["version"]
+                since_snapshot = 0 if entry["kind"] != "delta" else since_snapshot + 1
+            head = (version, since_snapshot)
+        return head
+
+    async def record(
+        self, user_id: str, previous: Optional[Dict], current: Optional[Dict]
+    ):
+        """Record the change from ``previous`` to ``current`` (None = deleted)."""
+        if previous == current:
+            return
+
+        version, since_snapshot = await self._head(user_id)
+        entry = {"version": version + 1, "timestamp": time.time()}
+        if current is None:
+            entry["kind"] = "delete"
+        elif (
+            previous is None
+            or version == 0
+            or since_snapshot + 1 >= self.snapshot_interval
+        ):
+            entry.update(kind="snapshot", state=current)
+        else:
+            entry.update(kind="delta", **self._delta(previous, current))
+        await self._append(user_id, entry)
+        self._heads.put(
+            user_id,
+            (version + 1, since_snapshot + 1 if entry["kind"] == "delta" else 0),
+        )
+
+    @staticmethod
+    def _delta(previous: Dict, current: Dict) -> Dict:
+        missing = object()
+        return {
+            "set": {
+                key: value
+                for key, value in current.items()
+                if previous.get(key, missing) != value
+            },
+            "unset": [key for key in previous if key not in current],
+        }
+
+    @staticmethod
+    def _apply(state: Optional[Dict], entry: Dict) -> Optional[Dict]:
+        if entry["kind"] == "delete":
+            return None
+        if entry["kind"] == "snapshot":
+            return dict(entry["state"])
+        state = dict(state or {})
+        state.update(entry["set"])
+        for key in entry["unset"]:
+            state.pop(key, None)
+        return state
+
+    @staticmethod
+    def _selects(entry: Dict, as_of: Optional[AsOf], version: Optional[int]) -> bool:
+        if version is not None:
+            return entry["version"] <= version
+        if as_of is None:
+            return True
+        if isinstance(as_of, str):
+            as_of = datetime.fromisoformat(as_of)
+        if isinstance(as_of, datetime):
+            as_of = as_of.timestamp()
+        return entry["timestamp"] <= as_of
+
+    async def state_at(
+        self,
+        user_id: str,
+        as_of: Optional[AsOf] = None,
+        version: Optional[int] = None,
+    ) -> Optional[Dict]:
+        """Return the record as of a point in time or a version number."""
+        if as_of is not None and version is not None:
+            raise ValueError("Pass either as_of or version, not both")
+        selected = [
+            entry
+            for entry in await self._entries(user_id)
+            if self._selects(entry, as_of, version)
+        ]
+        start = max(
+            (i for i, entry in enumerate(selected) if entry["kind"] != "delta"),
+            default=0,
+        )
+        state = None
+        for entry in selected[start:]:
+            state = self._apply(state, entry)
+        return state
+
+    async def versions(self, user_id: str) -> List[Dict[str, Any]]:
+        versions = []
+        for entry in await self._entries(user_id):
+            if entry["kind"] == "delta":
+                changed = sorted([*entry["set"], *entry["unset"]])
+            elif entry["kind"] == "snapshot":
+                changed = sorted(entry["state"])
+            else:
+                changed = []
+            versions.append(
+                {
+                    "version": entry["version"],
+                    "timestamp": datetime.fromtimestamp(entry["timestamp"]).isoformat(),
+                    "kind": entry["kind"],
+                    "changed_keys": changed,
+                }
+            )
+        return versions
+
+    async def diff(
+        self, user_id: str, from_version: int, to_version: Optional[int] = None
+    ) -> Dict[str, Dict]:
+        old = await self.state_at(user_id, version=from_version) or {}
+        new = await self.state_at(user_id, version=to_version) or {}
+        return {
+            "added": {k: v for k, v in new.items() if k not in old},
+            "removed": {k: v for k, v in old.items() if k not in new},
+            "changed": {
+                k: {"old": old[k], "new": v}
+                for k, v in new.items()
+                if k in old and old[k] != v
+            },
+        }
+
+
+class JSONLinesHistory(BaseHistory):
+    """History appended to a JSON-lines file, one line per version.
+
+    Byte offsets of each user's lines are indexed on first use, so reading one
+    user's history only touches that user's lines.
+    """
+
+    def __init__(self, history_file: str = "memory.history.jsonl", **kwargs):
+        super().__init__(**kwargs)
+        self.history_file = history_file
+        self._offsets: Optional[Dict[str, List[int]]] = None
+        self._lock = asyncio.Lock()
+
+    async def _append(self, user_id: str, entry: Dict):
+        line = (json.dumps({"user_id": user_id, **entry}) + "\n").encode()
+        async with self._lock:
+            offsets = await self._index()
+            offset = await asyncio.to_thread(self._write_line, line)
+            offsets.setdefault(user_id, []).append(offset)
+
+    async def _entries(self, user_id: str) -> List[Dict]:
+        async with self._lock:
+            offsets = list((await self._index()).get(user_id, []))
+        return await asyncio.to_thread(self._read_lines, offsets)
+
+    async def _index(self) -> Dict[str, List[int]]:
+        if self._offsets is None:
+            self._offsets = await asyncio.to_thread(self._build_index)
+        return self._offsets
+
+    def _build_index(self) -> Dict[str, List[int]]:
+        offsets = {}
+        if not os.path.exists(self.history_file):
+            return offsets
+        with open(self.history_file, "rb+") as f:
+            offset = 0
+            for line in iter(f.readline, b""):
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("unterminated line")
+                    user_id = json.loads(line)["user_id"]
+                except ValueError:
+                    # A torn final write; drop it so later appends stay readable.
+                    f.truncate(offset)
+                    break
+                offsets.setdefault(user_id, []).append(offset)
+                offset += len(line)
+        return offsets
+
+    def _write_line(self, line: bytes) -> int:
+        with open(self.history_file, "ab") as f:
+            offset = f.tell()
+            f.write(line)
+        return offset
+
+    def _read_lines(self, offsets: List[int]) -> List[Dict]:
+        if not offsets:
+            return []
+        entries = []
+        with open(self.history_file, "rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                entries.append(json.loads(f.readline()))
+        return entries
+
+
+class SQLiteHistory(BaseHistory):
+    """History stored in an SQLite table keyed by (user_id, version)."""
+
+    def __init__(self, db_file: str = "memory.db", **kwargs):
+        super().__init__(**kwargs)
+        self.db_file = db_file
+        self._conn = None
+        self._lock = threading.Lock()
+
+    async def _append(self, user_id: str, entry: Dict):
+        await asyncio.to_thread(
+            self._execute,
+            "INSERT INTO memory_history (user_id, version, entry) VALUES (?, ?, ?)",
+            (user_id, entry["version"], json.dumps(entry)),
+        )
+
+    async def _entries(self, user_id: str) -> List[Dict]:
+        rows = await asyncio.to_thread(
+            self._execute,
+            "SELECT entry FROM memory_history WHERE user_id = ? ORDER BY version",
+            (user_id,),
+        )
+        return [json.loads(row[0]) for row in rows]
+
+    async def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _execute(self, sql: str, params: tuple) -> List[tuple]:
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                return conn.execute(sql, params).fetchall()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS memory_history (user_id TEXT NOT NULL, "
+                "version INTEGER NOT NULL, entry TEXT NOT NULL, "
+                "PRIMARY KEY (user_id, version))"
+            )
+            self._conn = conn
+        return self._conn
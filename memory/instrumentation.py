@@ -0,0 +1,219 @@
+import bisect
+import importlib.util
+import time
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional, Sequence
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+
+class MemoryCallback:
+    """Receives instrumentation events from a memory object.
+
+    Subclasses override the events they care about. ``stage`` names are
+    ``update_memory``, ``batch_update_memory``, ``get_memory_context`` and
+    the steps inside them: ``extract``, ``extract_batch``, ``find_key``,
+    ``resolve_conflict``, ``patch``, ``beliefs``, ``save``, ``retrieve``,
+    ``filter_context`` and ``summarize``, plus ``flush`` for group commits,
+    whose ``on_persist`` events report ``"*"`` as the user.
+    """
+
+    def on_stage(self, stage: str, duration: float, user_id: Optional[str] = None):
+        pass
+
+    def on_llm_call(
+        self,
+        stage: str,
+        duration: float,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        cached: bool = False,
+    ):
+        pass
+
+    def on_persist(self, user_id: str, bytes_written: int, duration: float):
+        pass
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the ``q``-th percentile."""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+class HistogramAggregator(MemoryCallback):
+    """Keeps in-process latency histograms per stage and running counters."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.stages: Dict[str, Histogram] = {}
+        self.llm_latency: Dict[str, Histogram] = {}
+        self.counters = {
+            "llm_calls": 0,
+            "llm_cache_hits": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "bytes_persisted": 0,
+            "saves": 0,
+        }
+
+    def _histogram(self, histograms: Dict[str, Histogram], name: str) -> Histogram:
+        if name not in histograms:
+            histograms[name] = Histogram(self.buckets)
+        return histograms[name]
+
+    def on_stage(self, stage: str, duration: float, user_id: Optional[str] = None):
+        self._histogram(self.stages, stage).record(duration)
+
+    def on_llm_call(
+        self,
+        stage: str,
+        duration: float,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        cached: bool = False,
+    ):
+        if cached:
+            self.counters["llm_cache_hits"] += 1
+            return
+        self.counters["llm_calls"] += 1
+        self.counters["prompt_tokens"] += prompt_tokens
+        self.counters["completion_tokens"] += completion_tokens
+        self._histogram(self.llm_latency, stage).record(duration)
+
+    def on_persist(self, user_id: str, bytes_written: int, duration: float):
+        self.counters["saves"] += 1
+        self.counters["bytes_persisted"] += bytes_written
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "stages": {name: h.snapshot() for name, h in self.stages.items()},
+            "llm_latency": {name: h.snapshot() for name, h in self.llm_latency.items()},
+            **self.counters,
+        }
+
+
+class OpenTelemetryExporter(MemoryCallback):
+    """Records the events as OpenTelemetry metrics.
+
+    Requires ``opentelemetry-api``; metrics go to the globally configured
+    meter provider unless ``meter_provider`` is given.
+    """
+
+    def __init__(self, meter_provider: Any = None, prefix: str = "tovana"):
+        if not importlib.util.find_spec("opentelemetry"):
+            raise ImportError(
+                "Unable to import opentelemetry-api. Please install with "
+                "`pip install -U opentelemetry-api`"
+            )
+        from opentelemetry import metrics
+
+        meter = metrics.get_meter("tovana", meter_provider=meter_provider)
+        self._stage_duration = meter.create_histogram(
+            f"{prefix}.stage.duration", unit="s"
+        )
+        self._llm_duration = meter.create_histogram(f"{prefix}.llm.duration", unit="s")
+        self._llm_calls = meter.create_counter(f"{prefix}.llm.calls")
+        self._tokens = meter.create_counter(f"{prefix}.llm.tokens")
+        self._bytes_persisted = meter.create_counter(
+            f"{prefix}.storage.bytes_written", unit="By"
+        )
+
+    def on_stage(self, stage: str, duration: float, user_id: Optional[str] = None):
+        self._stage_duration.record(duration, {"stage": stage})
+
+    def on_llm_call(
+        self,
+        stage: str,
+        duration: float,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        cached: bool = False,
+    ):
+        self._llm_calls.add(1, {"stage": stage, "cached": cached})
+        if cached:
+            return
+        self._llm_duration.record(duration, {"stage": stage})
+        self._tokens.add(prompt_tokens, {"stage": stage, "type": "prompt"})
+        self._tokens.add(completion_tokens, {"stage": stage, "type": "completion"})
+
+    def on_persist(self, user_id: str, bytes_written: int, duration: float):
+        self._bytes_persisted.add(bytes_written)
+
+
+class _StageTimer:
+    __slots__ = ("callbacks", "stage", "user_id", "start")
+
+    def __init__(
+        self, callbacks: List[MemoryCallback], stage: str, user_id: Optional[str]
+    ):
+        self.callbacks = callbacks
+        self.stage = stage
+        self.user_id = user_id
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        duration = time.perf_counter() - self.start
+        for callback in self.callbacks:
+            callback.on_stage(self.stage, duration, self.user_id)
+
+
+_DISABLED = nullcontext()
+
+
+def stage_timer(
+    callbacks: List[MemoryCallback], stage: str, user_id: Optional[str] = None
+):
+    """Context manager timing ``stage``; a shared no-op when nobody listens."""
+    if not callbacks:
+        return _DISABLED
+    return _StageTimer(callbacks, stage, user_id)
@@ -0,0 +1,129 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import BaseMessage
+
+from ..cache import LRUCache
+
+
+class LLMResponseCache:
+    """Content-addressed cache of LLM completions.
+
+    Entries are keyed by a hash of the rendered prompt messages and the model
+    settings. Lookups go to an in-memory LRU first and then, if ``db_file``
+    is given, to an SQLite table that survives restarts and can be shared
+    between processes. By default completions are only cached for models
+    running at temperature 0, where a repeated prompt yields the same answer.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10_000,
+        ttl: Optional[float] = None,
+        db_file: Optional[str] = None,
+        deterministic_only: bool = True,
+    ):
+        self.ttl = ttl
+        self.db_file = db_file
+        self.deterministic_only = deterministic_only
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = LRUCache(max_entries=max_entries)
+        self._conn = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(messages: List[BaseMessage], llm_settings: str) -> str:
+        payload = json.dumps(
+            [llm_settings, [(message.type, message.content) for message in messages]],
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def accepts(self, llm: Any) -> bool:
+        # An unset temperature means the provider default, which is not 0.
+        return not self.deterministic_only or getattr(llm, "temperature", None) == 0
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._memory.peek(key)
+        if entry is not None and not self._expired(entry[0]):
+            self._memory.get(key)
+            self.memory_hits += 1
+            return entry[1]
+
+        if self.db_file:
+            row = await asyncio.to_thread(self._get_from_disk, key)
+            if row is not None and not self._expired(row[0]):
+                self._memory.put(key, row)
+                self.disk_hits += 1
+                return row[1]
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: str):
+        expires_at = time.time() + self.ttl if self.ttl else None
+        self._memory.put(key, (expires_at, value))
+        if self.db_file:
+            await asyncio.to_thread(self._set_on_disk, key, value, expires_at)
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "hits": hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "saved_calls": hits,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "entries": len(self._memory),
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    @staticmethod
+    def _expired(expires_at: Optional[float]) -> bool:
+        return expires_at is not None and expires_at < time.time()
+
+    def _get_from_disk(self, key: str):
+        with self._lock:
+            return (
+                self._connect()
+                .execute(
+                    "SELECT expires_at, value FROM llm_cache WHERE key = ?", (key,)
+                )
+                .fetchone()
+            )
+
+    def _set_on_disk(self, key: str, value: str, expires_at: Optional[float]):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) "
+                    "VALUES (?, ?, ?)",
+                    (key, value, expires_at),
+                )
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+            self._conn = conn
+        return self._conn
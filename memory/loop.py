@@ -0,0 +1,75 @@
+import asyncio
+import os
+import threading
+from typing import Any, Coroutine, Optional
+
+
+class BackgroundLoop:
+    """An event loop running forever in a daemon thread.
+
+    The synchronous facades submit their coroutines here instead of calling
+    ``asyncio.run`` per call, so connection pools, locks and background tasks
+    survive between calls and the sync API also works from threads that
+    already run an event loop of their own. A forked child inherits the loop
+    but not its thread, so the loop is rebuilt in the first process that uses
+    it after a fork.
+    """
+
+    _shared: Optional["BackgroundLoop"] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls) -> "BackgroundLoop":
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        self._check_fork()
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="tovana-loop", daemon=True
+                )
+                self._thread.start()
+            return self._loop
+
+    def run(self, coro: Coroutine) -> Any:
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError(
+                "The synchronous memory API cannot be called from its own event "
+                "loop thread; use the async API instead."
+            )
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def stop(self):
+        self._check_fork()
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._loop = None
+            self._thread = None
+
+    def _check_fork(self):
+        if self._pid == os.getpid():
+            return
+        # The inherited loop has no thread driving it and the lock may have
+        # been held by a thread that does not exist here; drop both without
+        # touching the loop, whose selector is shared with the parent.
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._pid = os.getpid()
@@ -1,22 +1,156 @@
 import asyncio
+import atexit
+import hashlib
 import json
-import os
+import logging
+import re
+import threading
+import time
+import weakref
 from datetime import datetime
-from typing import Dict, List, Optional, Union
+from difflib import SequenceMatcher
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
-import aiofiles
+from langchain_core.exceptions import OutputParserException
 from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import BaseMessage
-from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
+from langchain_core.output_parsers import (
+    BaseOutputParser,
+    JsonOutputParser,
+    StrOutputParser,
+)
 from langchain_core.prompts import (
+    BasePromptTemplate,
     ChatPromptTemplate,
     FewShotPromptTemplate,
     PromptTemplate,
 )
 
+from .beliefs import BeliefScheduler
+from .bulk import BulkIngestor, BulkUpdateResult, Conversations
+from .cache import LRUCache
+from .changes import ChangeFeed, MemoryChange, Subscription
+from .compaction import MemoryCompactor
+from .context import rank_keys, render_budgeted_context
+from .flusher import GroupCommitFlusher
+from .history import AsOf, BaseHistory
+from .instrumentation import MemoryCallback, stage_timer
+from .llms.cache import LLMResponseCache
 from .llms.llms import GenericLLMProvider
+from .loop import BackgroundLoop
+from .prefilter import MessagePrefilter
+from .ratelimit import TokenBucket, run_rate_limiter
+from .retrieval import BaseEmbedder, MemoryIndex, estimate_tokens
+from .storage import BaseSerializer, BaseStorage, JSONFileStorage, WriteConflictError
+
+logger = logging.getLogger(__name__)
 
 MAX_KEY_LENGTH = 17
+# Bookkeeping stored alongside the user's facts, such as per-key update times.
+META_KEY = "_meta"
+RESERVED_KEYS = ("last_updated", "beliefs", META_KEY)
+CONTEXT_HIDDEN_KEYS = ("last_updated", META_KEY)
+UPDATE_STRATEGIES = ("pipeline", "consolidated")
+# How often an update is redone after another process changed the record.
+WRITE_CONFLICT_RETRIES = 3
+CONTEXT_RETRIEVAL_MODES = ("local", "llm")
+# Read-side renderings of a user record, cached per user by ``_view``.
+VIEW_RENDERERS = {
+    "memory": "_render_memory",
+    "context": "_render_context",
+    "entries": "_context_entries",
+    "ranked_entries": "_ranked_context_entries",
+}
+KEY_SYNONYMS = (
+    ("pet", "animal", "dog", "cat"),
+    ("location", "city", "residence", "home", "address", "lives_in", "hometown"),
+    ("job", "occupation", "profession", "work", "career", "employment", "role"),
+    ("family", "spouse", "partner", "children", "kid", "relative", "family_member"),
+    ("hobby", "interest", "activity", "pastime"),
+    ("food_preference", "diet", "dietary_preference", "dietary_restriction"),
+    ("name", "full_name", "first_name"),
+    ("education", "school", "study", "university", "college", "field_of_study"),
+    ("important_event", "event", "life_event", "milestone"),
+    ("travel_plan", "trip", "travel", "vacation", "upcoming_trip"),
+)
+
+
+class KeyMatcher:
+    """Maps a newly extracted key onto an existing memory key without an LLM.
+
+    Keys are compared after normalization and light stemming, then through a
+    synonym table, and finally by fuzzy string similarity. The first key of
+    each synonym group is its head: only a member and its head are treated as
+    synonyms (``spouse`` and ``family``), while two members (``spouse`` and
+    ``children``) are merely related and left to the LLM. ``match`` returns
+    the best existing key together with a confidence between 0 and 1.
+    """
+
+    def __init__(self, synonyms: Tuple[Tuple[str, ...], ...] = KEY_SYNONYMS):
+        self._synonym_groups = {}
+        for group_id, group in enumerate(synonyms):
+            for position, key in enumerate(group):
+                self._synonym_groups[self.canonical(key)] = (group_id, position == 0)
+
+    @staticmethod
+    def normalize(key: str) -> str:
+        return "_".join(re.findall(r"[a-z0-9]+", key.lower()))
+
+    @staticmethod
+    def stem(token: str) -> str:
+        if len(token) > 4 and token.endswith("ies"):
+            return token[:-3] + "y"
+        if len(token) > 4 and token.endswith(("ches", "shes", "sses", "xes")):
+            return token[:-2]
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            return token[:-1]
+        return token
+
+    def canonical(self, key: str) -> str:
+        return "_".join(self.stem(token) for token in self.normalize(key).split("_"))
+
+    def similarity(self, key: str, other: str) -> float:
+        key, other = self.canonical(key), self.canonical(other)
+        if key == other:
+            return 1.0
+        group, is_head = self._synonym_groups.get(key, (None, False))
+        other_group, other_is_head = self._synonym_groups.get(other, (None, False))
+        same_group = group is not None and group == other_group
+        if same_group and (is_head or other_is_head):
+            return 0.95
+
+        score = SequenceMatcher(None, key, other).ratio()
+        tokens, other_tokens = set(key.split("_")), set(other.split("_"))
+        if tokens <= other_tokens or other_tokens <= tokens:
+            # "food" vs "favorite_food" is likely related but not certain.
+            score = max(score, 0.8)
+        if same_group:
+            # "dog" vs "cat": related, but possibly different facts.
+            score = max(score, 0.6)
+        return score
+
+    def match(
+        self, new_key: str, existing_keys: List[str]
+    ) -> Tuple[Optional[str], float]:
+        best_key, best_score = None, 0.0
+        for existing_key in existing_keys:
+            score = self.similarity(new_key, existing_key)
+            if score > best_score:
+                best_key, best_score = existing_key, score
+        return best_key, best_score
 
 
 class BaseAsyncMemory:
@@ -26,77 +160,980 @@ class BaseAsyncMemory:
         business_description: str,
         include_beliefs: bool = False,
         memory_file: str = "memory.json",
+        persistence: str = "snapshot",
+        log_compaction_threshold: int = 1000,
+        serializer: Union[str, BaseSerializer] = "json",
+        storage: Optional[BaseStorage] = None,
+        cache_max_entries: Optional[int] = 10_000,
+        cache_max_bytes: Optional[int] = None,
+        coalesce_updates: bool = False,
+        key_match_threshold: float = 0.85,
+        key_match_floor: float = 0.5,
+        key_matcher: Optional[KeyMatcher] = None,
+        update_strategy: str = "pipeline",
+        max_concurrent_llm_calls: int = 4,
+        belief_quiet_period: Optional[float] = None,
+        belief_max_pending_changes: int = 10,
+        llm_cache: Optional[LLMResponseCache] = None,
+        rate_limiter: Optional[TokenBucket] = None,
+        extraction_window_tokens: int = 3000,
+        extraction_window_overlap: int = 300,
+        context_retrieval: str = "local",
+        context_top_k: int = 8,
+        context_max_tokens: Optional[int] = None,
+        context_key_priorities: Optional[Dict[str, float]] = None,
+        embedder: Optional[BaseEmbedder] = None,
+        compactor: Optional[MemoryCompactor] = None,
+        callbacks: Optional[List[MemoryCallback]] = None,
+        history: Optional[BaseHistory] = None,
+        flush_interval: Optional[float] = None,
+        flush_max_dirty: int = 100,
+        prefilter: Optional[MessagePrefilter] = None,
+        use_prefilter: bool = True,
+        deduplicate_messages: bool = False,
+        dedup_max_seen: int = 256,
     ):
+        if update_strategy not in UPDATE_STRATEGIES:
+            raise ValueError(
+                f"Unsupported {update_strategy=}. Supported strategies are: "
+                f"{', '.join(UPDATE_STRATEGIES)}"
+            )
+        if context_retrieval not in CONTEXT_RETRIEVAL_MODES:
+            raise ValueError(
+                f"Unsupported {context_retrieval=}. Supported modes are: "
+                f"{', '.join(CONTEXT_RETRIEVAL_MODES)}"
+            )
+        if flush_interval is not None and storage is not None and storage.shared:
+            # Buffered saves cannot be redone if another process wrote first.
+            raise ValueError(
+                "flush_interval cannot be used with a storage shared between "
+                f"processes such as {type(storage).__name__}"
+            )
         self.llm = llm
+        self.llm_cache = llm_cache
+        self.rate_limiter = rate_limiter
         self.memory_file = memory_file
         self.business_description = business_description
         self.include_beliefs = include_beliefs
-        self.memory = {}
-
-    async def _load_memory(self) -> Dict[str, Dict]:
-        if os.path.exists(self.memory_file):
-            async with aiofiles.open(self.memory_file, "r") as f:
-                content = await f.read()
-                return json.loads(content)
-        return {}
-
-    async def _save_memory(self):
-        async with aiofiles.open(self.memory_file, "w") as f:
-            await f.write(json.dumps(self.memory, indent=2))
-
-    async def get_memory(self, user_id: str) -> Optional[str]:
-        if user_id in self.memory:
-            return json.dumps(self.memory[user_id], indent=2)
+        self.storage = storage or JSONFileStorage(
+            memory_file,
+            persistence=persistence,
+            log_compaction_threshold=log_compaction_threshold,
+            serializer=serializer,
+        )
+        self.cache = LRUCache(max_entries=cache_max_entries, max_bytes=cache_max_bytes)
+        self.update_strategy = update_strategy
+        self.coalesce_updates = coalesce_updates
+        self.max_concurrent_llm_calls = max_concurrent_llm_calls
+        self.extraction_window_tokens = extraction_window_tokens
+        self.extraction_window_overlap = extraction_window_overlap
+        self.context_retrieval = context_retrieval
+        self.context_top_k = context_top_k
+        self.context_max_tokens = context_max_tokens
+        self.context_key_priorities = context_key_priorities or {}
+        self.memory_index = MemoryIndex(embedder, max_users=cache_max_entries)
+        self.compactor = compactor
+        self.callbacks = list(callbacks or [])
+        self.history = history
+        self.changes = ChangeFeed()
+        self.flusher = (
+            GroupCommitFlusher(
+                self._flush_records,
+                flush_interval=flush_interval,
+                max_dirty=flush_max_dirty,
+            )
+            if flush_interval is not None
+            else None
+        )
+        self.prefilter = (prefilter or MessagePrefilter()) if use_prefilter else None
+        self.deduplicate_messages = deduplicate_messages
+        self.dedup_max_seen = dedup_max_seen
+        self.dedup_stats = {"duplicates": 0}
+        self._compacting = set()
+        # Record size of users whose last compaction reclaimed nothing.
+        self._compaction_floor = LRUCache(max_entries=cache_max_entries)
+        self.key_match_threshold = key_match_threshold
+        self.key_match_floor = key_match_floor
+        self.key_matcher = key_matcher or KeyMatcher()
+        self.key_match_stats = {"local": 0, "new": 0, "llm": 0}
+        self.belief_scheduler = (
+            BeliefScheduler(
+                self._regenerate_beliefs,
+                quiet_period=belief_quiet_period,
+                max_pending_changes=belief_max_pending_changes,
+            )
+            if belief_quiet_period is not None
+            else None
+        )
+        self._views = LRUCache(max_entries=cache_max_entries)
+        self._views_lock = threading.Lock()
+        self._user_locks = weakref.WeakValueDictionary()
+        self._pending_messages = {}
+        self._background_tasks = set()
+
+    async def _get_user_memory(self, user_id: str) -> Optional[Dict]:
+        user_memory = self.cache.get(user_id)
+        if user_memory is not None:
+            if (
+                not self.storage.shared
+                or self.cache.is_dirty(user_id)
+                or await self.storage.is_current(user_id)
+            ):
+                return user_memory
+            # Another process saved the user since we cached it.
+            self.cache.pop(user_id)
+
+        if self.flusher and user_id in self.flusher:
+            return self.flusher.get(user_id)
+        user_memory = await self.storage.get(user_id)
+        if user_memory is not None:
+            await self._write_back(self.cache.put(user_id, user_memory))
+        return user_memory
+
+    async def _save_memory(self, user_id: str, user_memory: Dict):
+        previous = None
+        if self.history or self.changes.active:
+            previous = await self._get_user_memory(user_id)
+        if self.history:
+            await self._record_history(user_id, previous, user_memory)
+        self._invalidate_views(user_id)
+        if self.flusher:
+            with self._stage("save", user_id):
+                await self._write_back(self.cache.put(user_id, user_memory))
+                self.flusher.mark(user_id, user_memory)
+        else:
+            await self._persist(user_id, user_memory)
+        if self.changes.active:
+            self._publish_change(user_id, previous, user_memory)
+
+    async def _persist(self, user_id: str, user_memory: Dict):
+        bytes_written = self.storage.bytes_written
+        with self._stage("save", user_id) as timer:
+            await self._write_back(self.cache.put(user_id, user_memory, dirty=True))
+            if user_id in self.cache:
+                try:
+                    await self.storage.put(user_id, user_memory)
+                except WriteConflictError:
+                    # The record was built on a copy another process has since
+                    # replaced; drop it so the next read gets theirs.
+                    self.cache.pop(user_id)
+                    self._invalidate_views(user_id)
+                    self.memory_index.invalidate(user_id)
+                    raise
+                self.cache.mark_clean(user_id)
+        if self.callbacks:
+            # Approximate under concurrency: other users' writes that land
+            # while this one is in flight are counted here too.
+            written = self.storage.bytes_written - bytes_written
+            for callback in self.callbacks:
+                callback.on_persist(user_id, written, time.perf_counter() - timer.start)
+
+    async def _flush_records(self, records: Dict[str, Dict]):
+        bytes_written = self.storage.bytes_written
+        with self._stage("flush") as timer:
+            await self.storage.put_many(records)
+        for callback in self.callbacks:
+            callback.on_persist(
+                "*",
+                self.storage.bytes_written - bytes_written,
+                time.perf_counter() - timer.start,
+            )
+
+    async def flush(self):
+        """Write every saved change through to storage and sync it to disk.
+
+        Without ``flush_interval`` each save is already written before the
+        update returns, but backends may defer syncing it until now.
+        """
+        await self._flush()
+
+    async def _flush(self):
+        if self.flusher:
+            await self.flusher.flush()
+        await self.storage.sync()
+
+    def _publish_change(
+        self, user_id: str, previous: Optional[Dict], current: Optional[Dict]
+    ):
+        previous = previous or {}
+        record = current or {}
+        missing = object()
+        changed_keys = [
+            key
+            for key in [*record, *(key for key in previous if key not in record)]
+            if key not in CONTEXT_HIDDEN_KEYS
+            and previous.get(key, missing) != record.get(key, missing)
+        ]
+        if changed_keys:
+            self.changes.publish(
+                MemoryChange(
+                    user_id,
+                    "update" if current is not None else "delete",
+                    changed_keys,
+                    beliefs=record.get("beliefs"),
+                )
+            )
+
+    async def _record_history(
+        self, user_id: str, previous: Optional[Dict], current: Optional[Dict]
+    ):
+        # Bookkeeping changes on every update and is rebuilt on rollback, so
+        # keeping it out of the history keeps deltas small.
+        previous, current = (
+            (
+                {k: v for k, v in record.items() if k != META_KEY}
+                if record is not None
+                else None
+            )
+            for record in (previous, current)
+        )
+        await self.history.record(user_id, previous, current)
+
+    async def _write_back(self, entries: List[Tuple[str, Dict]]):
+        for user_id, user_memory in entries:
+            await self.storage.put(user_id, user_memory)
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
+    async def wait_for_background_tasks(self):
+        await self._drain_background_tasks()
+
+    async def _drain_background_tasks(self):
+        # Background work (beliefs, compaction) is best effort: its failures
+        # are logged so they cannot keep pending saves from being written.
+        if self.belief_scheduler:
+            try:
+                await self.belief_scheduler.flush()
+            except Exception:
+                logger.exception("Belief regeneration failed")
+        while self._background_tasks:
+            results = await asyncio.gather(
+                *self._background_tasks, return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error("Background memory task failed", exc_info=result)
+        await self.changes.drain()
+        await self.storage.wait_for_background_tasks()
+
+    async def close(self):
+        try:
+            await self._drain_background_tasks()
+        finally:
+            try:
+                await self._flush()
+                await self._write_back(self.cache.dirty_items())
+                await self.storage.close()
+            finally:
+                if self.history:
+                    await self.history.close()
+
+    async def _invoke_chain(
+        self,
+        prompt: BasePromptTemplate,
+        parser: BaseOutputParser,
+        inputs: Dict[str, Any],
+        stage: str = "llm",
+    ) -> Any:
+        with self._stage(stage):
+            prompt_value = await prompt.ainvoke(inputs)
+            key = None
+            if self.llm_cache and self.llm_cache.accepts(self.llm):
+                key = self.llm_cache.make_key(
+                    prompt_value.to_messages(), self._llm_settings()
+                )
+                completion = await self.llm_cache.get(key)
+                if completion is not None:
+                    try:
+                        parsed = parser.parse(completion)
+                    except OutputParserException:
+                        # Unparseable entries (e.g. cached by older versions)
+                        # are treated as misses and overwritten below.
+                        pass
+                    else:
+                        for callback in self.callbacks:
+                            callback.on_llm_call(stage, 0.0, cached=True)
+                        return parsed
+
+            for rate_limiter in (self.rate_limiter, run_rate_limiter.get()):
+                if rate_limiter:
+                    await rate_limiter.acquire()
+            start = time.perf_counter()
+            response = await self.llm.ainvoke(prompt_value)
+            if self.callbacks:
+                self._emit_llm_call(stage, time.perf_counter() - start, response)
+            if not isinstance(response.content, str):
+                return await parser.ainvoke(response)
+            # Parse before caching so a malformed completion is never replayed.
+            parsed = parser.parse(response.content)
+            if key is not None:
+                await self.llm_cache.set(key, response.content)
+            return parsed
+
+    def _stage(self, stage: str, user_id: Optional[str] = None):
+        return stage_timer(self.callbacks, stage, user_id)
+
+    def _emit_llm_call(self, stage: str, duration: float, response: BaseMessage):
+        usage = getattr(response, "usage_metadata", None) or {}
+        for callback in self.callbacks:
+            callback.on_llm_call(
+                stage,
+                duration,
+                prompt_tokens=usage.get("input_tokens", 0),
+                completion_tokens=usage.get("output_tokens", 0),
+            )
+
+    def _llm_settings(self) -> str:
+        try:
+            return self.llm._get_llm_string()
+        except Exception:
+            return repr(self.llm)
+
+    async def get_memory(
+        self,
+        user_id: str,
+        as_of: Optional[AsOf] = None,
+        version: Optional[int] = None,
+    ) -> Optional[str]:
+        """Return the user's memory, or with history enabled, the memory as of
+        a point in time (``as_of``) or a ``version`` number."""
+        if as_of is not None or version is not None:
+            user_memory = await self._require_history().state_at(
+                user_id, as_of, version
+            )
+            return self._render_memory(user_memory) if user_memory else None
+
+        user_memory = await self._get_user_memory(user_id)
+        if user_memory is not None:
+            return self._view(user_id, user_memory, "memory")
         return None
 
-    async def get_beliefs(self, user_id: str) -> Optional[str]:
-        if user_id in self.memory:
-            return self.memory[user_id].get("beliefs")
+    def _require_history(self) -> BaseHistory:
+        if self.history is None:
+            raise ValueError(
+                "Memory history is disabled; pass `history=` to enable versioning."
+            )
+        return self.history
+
+    async def get_history(self, user_id: str) -> List[Dict[str, Any]]:
+        return await self._require_history().versions(user_id)
+
+    async def diff_memory(
+        self, user_id: str, from_version: int, to_version: Optional[int] = None
+    ) -> Dict[str, Dict]:
+        return await self._require_history().diff(user_id, from_version, to_version)
+
+    async def rollback_memory(self, user_id: str, version: int) -> Dict:
+        """Restore the record as of ``version``; recorded as a new version."""
+        history = self._require_history()
+        async with self._user_lock(user_id):
+            restored = await history.state_at(user_id, version=version)
+            if restored is None:
+                raise ValueError(f"No memory for {user_id=} as of {version=}")
+            previous = await self._get_user_memory(user_id) or {}
+            restored.pop("last_updated", None)
+            return await self._commit_user_memory(user_id, restored, previous)
+
+    def _view(
+        self,
+        user_id: str,
+        user_memory: Dict,
+        name: Hashable,
+        render: Optional[Callable[[Dict], Any]] = None,
+    ) -> Any:
+        """Return a rendering of ``user_memory``, built at most once per record.
+
+        Views are tied to the record object they were rendered from. Updates
+        always replace the record, so a stale view is never served even to a
+        reader that raced with an update.
+        """
+        # The sync facade reads views from its caller's thread.
+        with self._views_lock:
+            views = self._views.get(user_id)
+            if views is None or views["record"] is not user_memory:
+                views = {"record": user_memory}
+                self._views.put(user_id, views)
+        view = views.get(name)
+        if view is None:
+            render = render or getattr(self, VIEW_RENDERERS[name])
+            view = views[name] = render(user_memory)
+        return view
+
+    def _invalidate_views(self, user_id: str):
+        with self._views_lock:
+            self._views.pop(user_id)
+
+    @staticmethod
+    def _render_memory(user_memory: Dict) -> str:
+        return json.dumps(
+            {key: value for key, value in user_memory.items() if key != META_KEY},
+            indent=2,
+        )
+
+    @staticmethod
+    def _render_context(user_memory: Dict) -> str:
+        return "User Memory:\n" + "".join(
+            f"{entry}\n" for entry in BaseAsyncMemory._context_entries(user_memory)
+        )
+
+    @staticmethod
+    def _context_entries(user_memory: Dict) -> List[str]:
+        return [
+            f"{key}: {value}"
+            for key, value in user_memory.items()
+            if key not in CONTEXT_HIDDEN_KEYS
+        ]
+
+    def _ranked_context_entries(self, user_memory: Dict) -> List[str]:
+        visible = {
+            key: value
+            for key, value in user_memory.items()
+            if key not in CONTEXT_HIDDEN_KEYS
+        }
+        ranked = rank_keys(
+            visible,
+            user_memory.get(META_KEY, {}).get("updated_at", {}),
+            self.context_key_priorities,
+        )
+        return [f"{key}: {visible[key]}" for key in ranked]
+
+    def _context_view(
+        self, user_id: str, user_memory: Dict, max_tokens: Optional[int]
+    ) -> str:
+        if max_tokens is None:
+            return self._view(user_id, user_memory, "context")
+        return self._view(
+            user_id,
+            user_memory,
+            ("context", max_tokens),
+            lambda record: self._render_budgeted_context(record, max_tokens),
+        )
+
+    def _render_budgeted_context(self, user_memory: Dict, max_tokens: int) -> str:
+        return render_budgeted_context(
+            {
+                key: value
+                for key, value in user_memory.items()
+                if key not in CONTEXT_HIDDEN_KEYS
+            },
+            user_memory.get(META_KEY, {}).get("updated_at", {}),
+            max_tokens,
+            self.context_key_priorities,
+        )
+
+    async def get_beliefs(self, user_id: str, fresh: bool = False) -> Optional[str]:
+        if fresh and self.belief_scheduler:
+            await self.belief_scheduler.wait(user_id)
+        user_memory = await self._get_user_memory(user_id)
+        if user_memory is not None:
+            return user_memory.get("beliefs")
         return None
 
-    async def update_memory(self, user_id: str, message: str) -> Dict:
-        if user_id not in self.memory:
-            self.memory[user_id] = {}
+    def _user_lock(self, user_id: str) -> asyncio.Lock:
+        lock = self._user_locks.get(user_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._user_locks[user_id] = lock
+        return lock
 
-        extracted_info = await self._extract_information(message)
-        await self._update_user_memory(user_id, extracted_info)
-        return self.memory[user_id]
+    async def update_memory(
+        self, user_id: str, message: str, message_id: Optional[str] = None
+    ) -> Dict:
+        """Update the user's memory from one message.
+
+        A ``message_id`` (or, with ``deduplicate_messages``, the message's
+        content hash) that was already processed for this user returns the
+        current memory without doing any work.
+        """
+        message_key = self._message_key(f"human: {message}", message_id)
+        with self._stage("update_memory", user_id):
+            if self.coalesce_updates:
+                return await self._coalesced_update_memory(
+                    user_id, message, message_key
+                )
+
+            async with self._user_lock(user_id):
+                return await self._retry_on_conflict(
+                    lambda: self._apply_message(user_id, message, message_key)
+                )
 
     async def batch_update_memory(
-        self, user_id: str, messages: Union[List[BaseMessage], List[Dict[str, str]]]
+        self,
+        user_id: str,
+        messages: Union[List[BaseMessage], List[Dict[str, str]]],
+        message_ids: Optional[List[Optional[str]]] = None,
+    ) -> Dict:
+        """Update the user's memory from a conversation.
+
+        Messages whose ``message_ids`` entry (or, with ``deduplicate_messages``,
+        their message id or content hash) was already processed are left out.
+        """
+        message_keys = self._conversation_keys(messages, message_ids)
+        with self._stage("batch_update_memory", user_id):
+            async with self._user_lock(user_id):
+                return await self._retry_on_conflict(
+                    lambda: self._apply_conversation(user_id, messages, message_keys)
+                )
+
+    async def _coalesced_update_memory(
+        self, user_id: str, message: str, message_key: Optional[str] = None
+    ) -> Dict:
+        # Messages that arrive while the user is busy wait in a queue; whoever
+        # gets the lock next processes the whole queue in a single pass.
+        future = asyncio.get_running_loop().create_future()
+        self._pending_messages.setdefault(user_id, []).append(
+            (message, message_key, future)
+        )
+
+        async with self._user_lock(user_id):
+            if not future.done():
+                pending = self._pending_messages.pop(user_id)
+                try:
+                    if len(pending) == 1:
+                        user_memory = await self._retry_on_conflict(
+                            lambda: self._apply_message(user_id, message, message_key)
+                        )
+                    else:
+                        message_keys = [key for _, key, _ in pending]
+                        messages = [
+                            {"role": "human", "content": pending_message}
+                            for pending_message, _, _ in pending
+                        ]
+                        user_memory = await self._retry_on_conflict(
+                            lambda: self._apply_conversation(
+                                user_id,
+                                messages,
+                                message_keys if any(message_keys) else None,
+                            )
+                        )
+                except Exception as e:
+                    for _, _, pending_future in pending:
+                        pending_future.set_exception(e)
+                except BaseException:
+                    for _, _, pending_future in pending:
+                        pending_future.cancel()
+                    raise
+                else:
+                    for _, _, pending_future in pending:
+                        pending_future.set_result(user_memory)
+
+        return future.result()
+
+    @staticmethod
+    async def _retry_on_conflict(apply: Callable[[], Awaitable[Dict]]) -> Dict:
+        # With a storage shared between processes, another process may save
+        # the user between our read and our write; redo the update on top of
+        # their record rather than overwrite it.
+        attempt = 0
+        while True:
+            try:
+                return await apply()
+            except WriteConflictError:
+                attempt += 1
+                if attempt > WRITE_CONFLICT_RETRIES:
+                    raise
+
+    def _message_key(self, line: str, message_id: Optional[str]) -> Optional[str]:
+        if message_id is not None:
+            return str(message_id)
+        if not self.deduplicate_messages:
+            return None
+        return "sha1:" + hashlib.sha1(line.encode()).hexdigest()[:16]
+
+    def _conversation_keys(
+        self,
+        messages: Union[List[BaseMessage], List[Dict[str, str]]],
+        message_ids: Optional[List[Optional[str]]],
+    ) -> Optional[List[Optional[str]]]:
+        if message_ids is None:
+            if not self.deduplicate_messages:
+                return None
+            message_ids = [
+                msg.id if isinstance(msg, BaseMessage) else msg.get("id")
+                for msg in messages
+            ]
+        elif len(message_ids) != len(messages):
+            raise ValueError(
+                f"Got {len(message_ids)} message ids for {len(messages)} messages"
+            )
+        return [
+            self._message_key(line, message_id)
+            for line, message_id in zip(self._format_messages(messages), message_ids)
+        ]
+
+    @staticmethod
+    def _seen_messages(user_memory: Optional[Dict]) -> List[str]:
+        return (user_memory or {}).get(META_KEY, {}).get("seen", [])
+
+    async def _apply_message(
+        self, user_id: str, message: str, message_key: Optional[str] = None
+    ) -> Dict:
+        message_keys = ()
+        if message_key is not None:
+            user_memory = await self._get_user_memory(user_id)
+            if message_key in self._seen_messages(user_memory):
+                self.dedup_stats["duplicates"] += 1
+                return user_memory or {}
+            message_keys = (message_key,)
+        if self.prefilter and not self.prefilter.should_extract(message):
+            return await self._get_user_memory(user_id) or {}
+        if self.update_strategy == "consolidated":
+            return await self._consolidated_update(
+                user_id, f"Message: {message}", message_keys
+            )
+
+        extracted_info = await self._extract_information(message)
+        return await self._update_user_memory(user_id, extracted_info, message_keys)
+
+    async def _apply_conversation(
+        self,
+        user_id: str,
+        messages: Union[List[BaseMessage], List[Dict[str, str]]],
+        message_keys: Optional[List[Optional[str]]] = None,
     ) -> Dict:
-        if user_id not in self.memory:
-            self.memory[user_id] = {}
+        if message_keys is not None:
+            # Skip messages processed before, and repeats within this batch.
+            seen = set(self._seen_messages(await self._get_user_memory(user_id)))
+            fresh = []
+            for message, key in zip(messages, message_keys):
+                if key in seen:
+                    self.dedup_stats["duplicates"] += 1
+                    continue
+                if key is not None:
+                    seen.add(key)
+                fresh.append((message, key))
+            messages = [message for message, _ in fresh]
+            message_keys = [key for _, key in fresh if key is not None]
+        if not messages or (
+            self.prefilter
+            and not self.prefilter.should_extract(*self._message_contents(messages))
+        ):
+            return await self._get_user_memory(user_id) or {}
+        message_keys = message_keys or ()
+        if self.update_strategy == "consolidated":
+            conversation = self._format_conversation(messages)
+            return await self._consolidated_update(
+                user_id, f"Conversation:\n{conversation}", message_keys
+            )
 
         extracted_info = await self._extract_batch_information(messages)
-        await self._update_user_memory(user_id, extracted_info)
-        return self.memory[user_id]
-
-    async def _update_user_memory(self, user_id: str, extracted_info: Dict[str, str]):
-        for key, value in extracted_info.items():
-            existing_key = await self._find_relevant_key(user_id, key)
-            if existing_key:
-                if isinstance(self.memory[user_id].get(existing_key), list):
-                    self.memory[user_id][existing_key].append(value)
+        return await self._update_user_memory(user_id, extracted_info, message_keys)
+
+    async def _update_user_memory(
+        self,
+        user_id: str,
+        extracted_info: Dict[str, str],
+        message_keys: Sequence[str] = (),
+    ) -> Dict:
+        # Work on a copy so readers never observe a half-applied update and a
+        # failed LLM call leaves the cached record untouched.
+        previous = await self._get_user_memory(user_id) or {}
+        user_memory = dict(previous)
+        semaphore = asyncio.Semaphore(self.max_concurrent_llm_calls)
+
+        async def find_relevant_key(key: str) -> Optional[str]:
+            async with semaphore:
+                return await self._find_relevant_key(user_id, key, user_memory)
+
+        # Key lookups are independent of each other, so they run concurrently;
+        # values are then grouped per target key in extraction order.
+        existing_keys = await asyncio.gather(
+            *(find_relevant_key(key) for key in extracted_info)
+        )
+        updates = {}
+        for (key, value), existing_key in zip(extracted_info.items(), existing_keys):
+            updates.setdefault(existing_key or key, []).append(value)
+
+        async def merge_values(key: str, values: List[Any]) -> Any:
+            current = user_memory.get(key)
+            for value in values:
+                if current is None:
+                    current = value
+                elif isinstance(current, list):
+                    current = current + [value]
                 else:
-                    new_value = await self._resolve_conflict(
-                        existing_key, self.memory[user_id].get(existing_key), value
-                    )
-                    self.memory[user_id][existing_key] = new_value
-            else:
-                self.memory[user_id][key] = value
+                    async with semaphore:
+                        current = await self._resolve_conflict(key, current, value)
+            return current
+
+        merged_values = await asyncio.gather(
+            *(merge_values(key, values) for key, values in updates.items())
+        )
+        for key, merged_value in zip(updates, merged_values):
+            user_memory[key] = merged_value
 
-        self.memory[user_id]["last_updated"] = datetime.now().isoformat()
+        return await self._commit_user_memory(
+            user_id, user_memory, previous, message_keys
+        )
+
+    async def _consolidated_update(
+        self, user_id: str, content: str, message_keys: Sequence[str] = ()
+    ) -> Dict:
+        previous = await self._get_user_memory(user_id) or {}
+        user_memory = dict(previous)
+        operations = await self._generate_memory_patch(user_memory, content)
+        self._apply_memory_patch(user_memory, operations)
+        return await self._commit_user_memory(
+            user_id, user_memory, previous, message_keys
+        )
 
-        if self.include_beliefs:
-            new_beliefs = await self._generate_new_beliefs(user_id)
+    async def _commit_user_memory(
+        self,
+        user_id: str,
+        user_memory: Dict,
+        previous: Dict,
+        message_keys: Sequence[str] = (),
+    ) -> Dict:
+        now = datetime.now().isoformat()
+        self._record_key_updates(
+            previous,
+            user_memory,
+            now,
+            # Per-item timestamps are only worth their space if items can age out.
+            track_items=bool(self.compactor and self.compactor.max_age is not None),
+        )
+        if message_keys:
+            # Bounded, oldest first: only recent redeliveries are recognized.
+            seen = self._seen_messages(previous) + list(message_keys)
+            user_memory[META_KEY]["seen"] = seen[-self.dedup_max_seen :]
+        user_memory["last_updated"] = now
+
+        if self.include_beliefs and not self.belief_scheduler:
+            new_beliefs = await self._generate_new_beliefs(user_id, user_memory)
             if new_beliefs:
-                self.memory[user_id]["beliefs"] = new_beliefs
+                user_memory["beliefs"] = new_beliefs
+
+        await self._save_memory(user_id, user_memory)
+        if self.include_beliefs and self.belief_scheduler:
+            self.belief_scheduler.schedule(user_id)
+        self._schedule_compaction(user_id, user_memory)
+        return user_memory
+
+    @staticmethod
+    def _record_key_updates(
+        previous: Dict, user_memory: Dict, now: str, track_items: bool = False
+    ):
+        meta = previous.get(META_KEY, {})
+        updated_at = {
+            key: timestamp
+            for key, timestamp in meta.get("updated_at", {}).items()
+            if key in user_memory
+        }
+        for key, value in user_memory.items():
+            if key not in RESERVED_KEYS and previous.get(key) != value:
+                updated_at[key] = now
+        user_memory[META_KEY] = {**meta, "updated_at": updated_at}
+        if not track_items:
+            return
+
+        # Epoch seconds, one per list item, used to evict stale items.
+        timestamp = int(time.time())
+        added_at = {}
+        for key, value in user_memory.items():
+            if key in RESERVED_KEYS or not isinstance(value, list):
+                continue
+            old_value = previous.get(key)
+            old_value = old_value if isinstance(old_value, list) else []
+            old_times = meta.get("added_at", {}).get(key, [])
+            if len(old_times) != len(old_value):
+                # Items stored before timestamps were tracked count as new.
+                old_times = [timestamp] * len(old_value)
+            if value is old_value or value == old_value:
+                added_at[key] = old_times
+            elif value[: len(old_value)] == old_value:
+                added_at[key] = old_times + [timestamp] * (len(value) - len(old_value))
+            else:
+                added_at[key] = [timestamp] * len(value)
+        user_memory[META_KEY]["added_at"] = added_at
+
+    def _schedule_compaction(self, user_id: str, user_memory: Dict):
+        if (
+            self.compactor
+            and user_id not in self._compacting
+            and self.compactor.needs_compaction(user_memory)
+        ):
+            floor = self._compaction_floor.peek(user_id)
+            # A record that could not be shrunk is only retried once it has
+            # grown by a tenth, instead of on every update.
+            if floor is not None and self.compactor.size_of(user_memory) < floor * 1.1:
+                return
+            self._compacting.add(user_id)
+            task = self._spawn(self._compact_memory(user_id))
+            task.add_done_callback(lambda _: self._compacting.discard(user_id))
+
+    async def compact_memory(self, user_id: str) -> int:
+        """Compact one user's record now; returns the number of bytes reclaimed."""
+        return await self._compact_memory(user_id)
+
+    async def _compact_memory(self, user_id: str) -> int:
+        compactor = self.compactor or MemoryCompactor()
+        user_memory = await self._get_user_memory(user_id)
+        if user_memory is None:
+            return 0
+
+        now = time.time()
+        compacted = dict(user_memory)
+        meta = dict(compacted.get(META_KEY, {}))
+        added_at = dict(meta.get("added_at", {}))
+        updated_at = dict(meta.get("updated_at", {}))
+        for key, value in user_memory.items():
+            if key in RESERVED_KEYS or not isinstance(value, list):
+                continue
+            times = added_at.get(key, [])
+            if len(times) != len(value):
+                times = [now] * len(value)
+            compacted[key], times = compactor.compact_list(value, times, now)
+            if key in added_at:
+                added_at[key] = times
+
+        # Summaries are generated outside the lock, like beliefs; a record
+        # that changed in the meantime is left for the next compaction.
+        oversized = [
+            key
+            for key, value in compacted.items()
+            if key not in RESERVED_KEYS and compactor.oversized(value)
+        ]
+        if oversized:
+            semaphore = asyncio.Semaphore(self.max_concurrent_llm_calls)
+
+            async def summarize(key: str) -> str:
+                async with semaphore:
+                    return await self._summarize_value(key, compacted[key])
+
+            summaries = await asyncio.gather(*(summarize(key) for key in oversized))
+            for key, summary in zip(oversized, summaries):
+                compacted[key] = summary
+                added_at.pop(key, None)
+                updated_at[key] = datetime.now().isoformat()
+            compactor.stats["keys_summarized"] += len(oversized)
+
+        if META_KEY in compacted:
+            compacted[META_KEY] = {**meta, "updated_at": updated_at}
+            if "added_at" in meta:
+                compacted[META_KEY]["added_at"] = added_at
+
+        if compacted == user_memory:
+            self._compaction_floor.put(user_id, compactor.size_of(user_memory))
+            return 0
+
+        async with self._user_lock(user_id):
+            current = await self._get_user_memory(user_id)
+            if current is not user_memory and current != user_memory:
+                return 0
+            await self._save_memory(user_id, compacted)
+        self._compaction_floor.pop(user_id)
+
+        reclaimed = max(
+            0, compactor.size_of(user_memory) - compactor.size_of(compacted)
+        )
+        compactor.stats["runs"] += 1
+        compactor.stats["bytes_reclaimed"] += reclaimed
+        return reclaimed
+
+    async def _regenerate_beliefs(self, user_id: str):
+        user_memory = await self._get_user_memory(user_id)
+        if user_memory is None:
+            return
+        new_beliefs = await self._generate_new_beliefs(user_id, user_memory)
+        if not new_beliefs:
+            return
+
+        # Beliefs are generated outside the lock; only the write has to be
+        # serialized with concurrent updates.
+        async with self._user_lock(user_id):
+            user_memory = await self._get_user_memory(user_id)
+            if user_memory is not None:
+                await self._save_memory(
+                    user_id, {**user_memory, "beliefs": new_beliefs}
+                )
 
-        await self._save_memory()
+    async def _generate_memory_patch(
+        self, user_memory: Dict, content: str
+    ) -> List[Dict[str, Any]]:
+        system_prompt = """
+            You are an AI assistant that maintains a memory of relevant personal information about a user.
+            Given the current user memory and new input, decide how the memory should change.
+            Focus on key details such as location, preferences, important events, or any other significant personal information.
+            Only extract information about the user, not the AI assistant. Ignore pleasantries and small talk. Less is more.
+
+            Return a JSON object of the form {{"operations": [{{"op": ..., "key": ..., "value": ...}}]}} where op is one of:
+            - "add": store information under a new key (lower case) that has no related existing key.
+            - "replace": overwrite an existing key when the new information updates it, or combine old and new into one short value.
+            - "append": add one more item to an existing key that holds a list of items, such as several pets.
+            Reuse existing keys whenever the information is related. Return {{"operations": []}} if nothing should change.
+            Do not use any specific format (like ```json), just provide the JSON.
+            Keep values concise and short with no explanations.
+            """
 
-    async def _find_relevant_key(self, user_id: str, new_key: str) -> Optional[str]:
-        existing_keys = ", ".join(self.memory[user_id].keys())
+        prompt = ChatPromptTemplate.from_messages(
+            [
+                ("system", system_prompt),
+                ("human", "Current user memory:\n{memory}\n\n{content}"),
+            ]
+        )
+        memory = {
+            key: value for key, value in user_memory.items() if key not in RESERVED_KEYS
+        }
+        patch = await self._invoke_chain(
+            prompt,
+            JsonOutputParser(),
+            {"memory": json.dumps(memory, indent=2), "content": content},
+            stage="patch",
+        )
+        if isinstance(patch, dict):
+            patch = patch.get("operations", [])
+        return patch if isinstance(patch, list) else []
+
+    @staticmethod
+    def _apply_memory_patch(user_memory: Dict, operations: List[Dict[str, Any]]):
+        for operation in operations:
+            if not isinstance(operation, dict):
+                continue
+            op, key, value = (
+                operation.get("op"),
+                operation.get("key"),
+                operation.get("value"),
+            )
+            if not key or key in RESERVED_KEYS or value is None:
+                continue
+
+            existing_value = user_memory.get(key)
+            if op == "append" or (op == "add" and existing_value is not None):
+                if isinstance(existing_value, list):
+                    if value not in existing_value:
+                        user_memory[key] = existing_value + [value]
+                elif existing_value is not None and existing_value != value:
+                    user_memory[key] = [existing_value, value]
+                else:
+                    user_memory[key] = value
+            elif op in ("add", "replace"):
+                user_memory[key] = value
+
+    async def _find_relevant_key(
+        self, user_id: str, new_key: str, user_memory: Dict
+    ) -> Optional[str]:
+        existing_keys = [key for key in user_memory if key not in RESERVED_KEYS]
+        match, confidence = self.key_matcher.match(new_key, existing_keys)
+        if confidence >= self.key_match_threshold:
+            self.key_match_stats["local"] += 1
+            return match
+        if confidence < self.key_match_floor:
+            self.key_match_stats["new"] += 1
+            return None
+
+        self.key_match_stats["llm"] += 1
+        return await self._find_relevant_key_with_llm(user_id, new_key, user_memory)
+
+    async def _find_relevant_key_with_llm(
+        self, user_id: str, new_key: str, user_memory: Dict
+    ) -> Optional[str]:
+        existing_keys = ", ".join(
+            key for key in user_memory if key not in RESERVED_KEYS
+        )
         template = """
                Find the most relevant existing key in the user's memory for the new information.
                If no relevant key exists, return "None".
@@ -116,15 +1153,21 @@ class BaseAsyncMemory:
                 ("human", template),
             ]
         )
-        chain = prompt | self.llm | StrOutputParser()
-        relevant_key = await chain.ainvoke(
-            input={
+        relevant_key = await self._invoke_chain(
+            prompt,
+            StrOutputParser(),
+            {
                 "user_id": user_id,
                 "new_key": new_key,
                 "existing_keys": existing_keys,
-            }
+            },
+            stage="find_key",
         )
-        if relevant_key == "None" or len(relevant_key) > MAX_KEY_LENGTH:
+        if (
+            relevant_key == "None"
+            or relevant_key in RESERVED_KEYS
+            or len(relevant_key) > MAX_KEY_LENGTH
+        ):
             return None
 
         return relevant_key
@@ -152,13 +1195,40 @@ class BaseAsyncMemory:
                 ("human", template),
             ]
         )
-        chain = prompt | self.llm | StrOutputParser()
-        resolved_value = await chain.ainvoke(
-            input={"key": key, "old_value": old_value, "new_value": new_value}
+        resolved_value = await self._invoke_chain(
+            prompt,
+            StrOutputParser(),
+            {"key": key, "old_value": old_value, "new_value": new_value},
+            stage="resolve_conflict",
         )
 
         return resolved_value
 
+    async def _summarize_value(self, key: str, value: Any) -> str:
+        template = """
+                Condense the following value stored under the key "{key}" in the user's memory.
+                Merge duplicates, drop outdated or trivial details and keep every distinct, still relevant fact.
+                Return only the condensed value as a short string with no explanation.
+
+                Value: {value}
+                """
+
+        prompt = ChatPromptTemplate.from_messages(
+            [
+                (
+                    "system",
+                    "You are an AI assistant that condenses oversized entries in user memory",
+                ),
+                ("human", template),
+            ]
+        )
+        return await self._invoke_chain(
+            prompt,
+            StrOutputParser(),
+            {"key": key, "value": json.dumps(value)},
+            stage="summarize",
+        )
+
     async def _extract_information(self, message: str) -> Dict[str, str]:
         system_prompt = """
           You are an AI assistant that extracts relevant personal information from messages
@@ -177,8 +1247,9 @@ class BaseAsyncMemory:
                 ("human", "Message: {user_message}"),
             ]
         )
-        chain = prompt | self.llm | JsonOutputParser()
-        extracted_info = await chain.ainvoke({"user_message": message})
+        extracted_info = await self._invoke_chain(
+            prompt, JsonOutputParser(), {"user_message": message}, stage="extract"
+        )
 
         return extracted_info
 
@@ -210,18 +1281,97 @@ class BaseAsyncMemory:
             ]
         )
 
-        if isinstance(messages[0], BaseMessage):
-            conversation = "\n".join([f"{msg.type}: {msg.content}" for msg in messages])
-        else:
-            conversation = "\n".join(
-                [f"{msg['role']}: {msg['content']}" for msg in messages]
-            )
-        chain = prompt | self.llm | JsonOutputParser()
-        extracted_info = await chain.ainvoke({"conversation": conversation})
+        semaphore = asyncio.Semaphore(self.max_concurrent_llm_calls)
+
+        async def extract(window: str) -> Dict[str, Any]:
+            async with semaphore:
+                extracted_info = await self._invoke_chain(
+                    prompt,
+                    JsonOutputParser(),
+                    {"conversation": window},
+                    stage="extract_batch",
+                )
+            return extracted_info if isinstance(extracted_info, dict) else {}
+
+        windows = self._conversation_windows(
+            self._format_messages(messages),
+            self.extraction_window_tokens,
+            self.extraction_window_overlap,
+        )
+        window_results = await asyncio.gather(*(extract(w) for w in windows))
 
+        # Windows are merged in conversation order, so facts from later in the
+        # conversation win conflicts, matching guideline 5 of the prompt.
+        extracted_info = {}
+        for window_result in window_results:
+            extracted_info.update(window_result)
         return extracted_info
 
-    async def _generate_new_beliefs(self, user_id: str):
+    @staticmethod
+    def _conversation_windows(
+        lines: List[str], max_tokens: int, overlap_tokens: int
+    ) -> List[str]:
+        """Split formatted conversation lines into overlapping windows.
+
+        Each window holds whole messages totalling at most ``max_tokens``
+        (estimated); a single longer message gets a window of its own. Every
+        window after the first repeats up to ``overlap_tokens`` of trailing
+        messages from the previous one so facts spanning a boundary survive.
+        """
+        sizes = [estimate_tokens(line) for line in lines]
+        windows = []
+        start = 0
+        while start < len(lines):
+            end, used = start, 0
+            while end < len(lines) and (
+                end == start or used + sizes[end] <= max_tokens
+            ):
+                used += sizes[end]
+                end += 1
+            windows.append("\n".join(lines[start:end]))
+            if end == len(lines):
+                break
+
+            next_start, overlap = end, 0
+            while (
+                next_start - 1 > start
+                and overlap + sizes[next_start - 1] <= overlap_tokens
+            ):
+                next_start -= 1
+                overlap += sizes[next_start]
+            start = next_start
+        return windows
+
+    @staticmethod
+    def _format_messages(
+        messages: Union[List[BaseMessage], List[Dict[str, str]]],
+    ) -> List[str]:
+        return [
+            (
+                f"{msg.type}: {msg.content}"
+                if isinstance(msg, BaseMessage)
+                else f"{msg['role']}: {msg['content']}"
+            )
+            for msg in messages
+        ]
+
+    @staticmethod
+    def _message_contents(
+        messages: Union[List[BaseMessage], List[Dict[str, str]]],
+    ) -> List[str]:
+        return [
+            str(msg.content if isinstance(msg, BaseMessage) else msg["content"])
+            for msg in messages
+        ]
+
+    @classmethod
+    def _format_conversation(
+        cls,
+        messages: Union[List[BaseMessage], List[Dict[str, str]]],
+    ) -> str:
+        return "\n".join(cls._format_messages(messages))
+
+    async def _generate_new_beliefs(self, user_id: str, user_memory: Dict):
         example_prompt = PromptTemplate.from_template(
             """
             Examples that will help you generate an amazing answer
@@ -265,13 +1415,15 @@ class BaseAsyncMemory:
             input_variables=["business_description", "memories", "beliefs"],
         )
 
-        chain = few_shot_prompt | self.llm | StrOutputParser()
-        beliefs = await chain.ainvoke(
+        beliefs = await self._invoke_chain(
+            few_shot_prompt,
+            StrOutputParser(),
             {
                 "business_description": self.business_description,
-                "memories": await self.get_memory(user_id),
-                "beliefs": self.memory.get("beliefs"),
-            }
+                "memories": self._render_memory(user_memory),
+                "beliefs": user_memory.get("beliefs"),
+            },
+            stage="beliefs",
         )
         return beliefs if beliefs != "None" else None
 
@@ -279,13 +1431,31 @@ class BaseAsyncMemory:
         self,
         user_id: str,
         message: Optional[str] = "",
+        max_tokens: Optional[int] = None,
+    ) -> str:
+        with self._stage("get_memory_context", user_id):
+            return await self._get_memory_context(user_id, message, max_tokens)
+
+    async def _get_memory_context(
+        self, user_id: str, message: Optional[str], max_tokens: Optional[int]
     ) -> str:
-        if user_id in self.memory:
-            context = "User Memory:\n"
-            for key, value in self.memory[user_id].items():
-                if key != "last_updated":
-                    context += f"{key}: {value}\n"
+        if max_tokens is None:
+            max_tokens = self.context_max_tokens
+        user_memory = await self._get_user_memory(user_id)
+        if user_memory is not None:
+            if message and self.context_retrieval == "local":
+                with self._stage("retrieve", user_id):
+                    entries = self.memory_index.search(
+                        user_id,
+                        self._view(user_id, user_memory, "entries"),
+                        message,
+                        top_k=self.context_top_k,
+                        max_tokens=max_tokens,
+                        fallback=self._view(user_id, user_memory, "ranked_entries"),
+                    )
+                return "User Memory:\n" + "".join(f"{entry}\n" for entry in entries)
 
+            context = self._context_view(user_id, user_memory, max_tokens)
             if message:
                 prompt = ChatPromptTemplate.from_messages(
                     [
@@ -302,60 +1472,164 @@ class BaseAsyncMemory:
                     ]
                 )
 
-                chain = prompt | self.llm | StrOutputParser()
-
-                filtered_context = await chain.ainvoke(
-                    {"context": context, "message": message}
+                filtered_context = await self._invoke_chain(
+                    prompt,
+                    StrOutputParser(),
+                    {"context": context, "message": message},
+                    stage="filter_context",
                 )
                 return filtered_context
             return context
         return "No memory found for this user."
 
     async def delete_memory(self, user_id: str) -> bool:
-        if user_id in self.memory:
-            del self.memory[user_id]
-            await self._save_memory()
-            return True
-        return False
+        async with self._user_lock(user_id):
+            previous = None
+            if self.history or self.changes.active:
+                previous = await self._get_user_memory(user_id)
+            if self.history:
+                await self._record_history(user_id, previous, None)
+            pending = False
+            if self.flusher:
+                # Let a flush that may carry this user's record land first.
+                await self.flusher.wait_idle()
+                pending = user_id in self.flusher
+                self.flusher.discard(user_id)
+            cached = self.cache.pop(user_id)
+            self._compaction_floor.pop(user_id)
+            self.memory_index.invalidate(user_id)
+            self._invalidate_views(user_id)
+            deleted = (
+                await self.storage.delete(user_id) or cached is not None or pending
+            )
+            if self.changes.active:
+                self._publish_change(user_id, previous, None)
+            return deleted
 
 
 class SyncMemory(BaseAsyncMemory):
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, loop: Optional[BackgroundLoop] = None, **kwargs):
         super().__init__(*args, **kwargs)
-        self.memory = asyncio.run(self._load_memory())
+        self._loop = loop or BackgroundLoop.shared()
+        # Closing writes through thread pools (asyncio.to_thread for file and
+        # SQLite I/O, and LLM output parsing), and concurrent.futures refuses
+        # new work once its own exit hook has run, which is before any atexit
+        # handler. threading._register_atexit is private, but it is the hook
+        # concurrent.futures itself uses, and hooks registered later run
+        # first. Interpreters without it fall back to atexit.
+        register_at_exit = getattr(threading, "_register_atexit", atexit.register)
+        register_at_exit(_close_at_exit, weakref.ref(self))
+
+    def _run(self, coro):
+        return self._loop.run(coro)
+
+    def _cached_user_memory(self, user_id: str) -> Optional[Dict]:
+        # Records already resident in the cache are served straight from the
+        # calling thread; ``peek`` only reads, so it is safe alongside the loop.
+        # Records of shared storages must be revalidated on the loop first.
+        if self.storage.shared:
+            return None
+        return self.cache.peek(user_id)
 
-    def update_memory(self, user_id: str, message: str) -> Dict:
-        return asyncio.run((super().update_memory(user_id, message)))
+    def get_memory(
+        self,
+        user_id: str,
+        as_of: Optional[AsOf] = None,
+        version: Optional[int] = None,
+    ) -> Optional[str]:
+        user_memory = self._cached_user_memory(user_id)
+        if user_memory is not None and as_of is None and version is None:
+            return self._view(user_id, user_memory, "memory")
+        return self._run(super().get_memory(user_id, as_of, version))
+
+    def get_history(self, user_id: str) -> List[Dict[str, Any]]:
+        return self._run(super().get_history(user_id))
+
+    def diff_memory(
+        self, user_id: str, from_version: int, to_version: Optional[int] = None
+    ) -> Dict[str, Dict]:
+        return self._run(super().diff_memory(user_id, from_version, to_version))
+
+    def rollback_memory(self, user_id: str, version: int) -> Dict:
+        return self._run(super().rollback_memory(user_id, version))
+
+    def update_memory(
+        self, user_id: str, message: str, message_id: Optional[str] = None
+    ) -> Dict:
+        return self._run(super().update_memory(user_id, message, message_id))
 
     def batch_update_memory(
-        self, user_id: str, messages: Union[List[BaseMessage], List[Dict[str, str]]]
+        self,
+        user_id: str,
+        messages: Union[List[BaseMessage], List[Dict[str, str]]],
+        message_ids: Optional[List[Optional[str]]] = None,
     ) -> Dict:
-        return asyncio.run(super().batch_update_memory(user_id, messages))
+        return self._run(super().batch_update_memory(user_id, messages, message_ids))
 
-    def get_beliefs(self, user_id: str) -> Optional[str]:
-        return asyncio.run(super().get_beliefs(user_id))
+    def get_beliefs(self, user_id: str, fresh: bool = False) -> Optional[str]:
+        user_memory = self._cached_user_memory(user_id)
+        if user_memory is not None and not fresh:
+            return user_memory.get("beliefs")
+        return self._run(super().get_beliefs(user_id, fresh))
 
-    def get_memory_context(self, user_id: str, message: Optional[str] = "") -> str:
-        return asyncio.run(super().get_memory_context(user_id, message))
+    def get_memory_context(
+        self,
+        user_id: str,
+        message: Optional[str] = "",
+        max_tokens: Optional[int] = None,
+    ) -> str:
+        user_memory = self._cached_user_memory(user_id)
+        if user_memory is not None and not message:
+            if max_tokens is None:
+                max_tokens = self.context_max_tokens
+            return self._context_view(user_id, user_memory, max_tokens)
+        return self._run(super().get_memory_context(user_id, message, max_tokens))
 
     def delete_memory(self, user_id: str) -> bool:
-        return asyncio.run(super().delete_memory(user_id))
+        return self._run(super().delete_memory(user_id))
+
+    def compact_memory(self, user_id: str) -> int:
+        return self._run(super().compact_memory(user_id))
+
+    def flush(self):
+        self._run(super().flush())
+
+    def wait_for_background_tasks(self):
+        self._run(super().wait_for_background_tasks())
+
+    def close(self):
+        self._run(super().close())
+
+
+def _close_at_exit(memory_ref: weakref.ref):
+    memory = memory_ref()
+    if memory is None:
+        return
+    try:
+        memory.close()
+    except Exception:
+        logger.exception("Failed to close memory at exit; pending changes may be lost")
 
 
 class BaseMemoryManager:
     def __init__(
         self,
-        api_key: str,
-        provider: str,
+        api_key: Optional[str] = None,
+        provider: Optional[str] = None,
         business_description: str = "A personal AI assistant",
         include_beliefs: bool = True,
+        memory_options: Optional[Dict[str, Any]] = None,
+        llm: Optional[BaseChatModel] = None,
         **kwargs,
     ):
-        self.llm = GenericLLMProvider.from_provider(
-            provider=provider, api_key=api_key, **kwargs
-        ).llm
+        if llm is None:
+            llm = GenericLLMProvider.from_provider(
+                provider=provider, api_key=api_key, **kwargs
+            ).llm
+        self.llm = llm
         self.business_description = business_description
         self.include_beliefs = include_beliefs
+        self.memory_options = memory_options or {}
 
 
 class AsyncMemoryManager(BaseMemoryManager):
@@ -365,27 +1639,116 @@ class AsyncMemoryManager(BaseMemoryManager):
             llm=self.llm,
             business_description=self.business_description,
             include_beliefs=self.include_beliefs,
+            **self.memory_options,
+        )
+
+    async def get_memory(
+        self,
+        user_id: str,
+        as_of: Optional[AsOf] = None,
+        version: Optional[int] = None,
+    ) -> str:
+        return (
+            await self.memory.get_memory(user_id, as_of, version)
+            or "No memory found for this user."
         )
 
-    async def get_memory(self, user_id: str) -> str:
-        return await self.memory.get_memory(user_id) or "No memory found for this user."
+    async def get_history(self, user_id: str) -> List[Dict[str, Any]]:
+        return await self.memory.get_history(user_id)
+
+    async def diff_memory(
+        self, user_id: str, from_version: int, to_version: Optional[int] = None
+    ) -> Dict[str, Dict]:
+        return await self.memory.diff_memory(user_id, from_version, to_version)
+
+    async def rollback_memory(self, user_id: str, version: int) -> Dict:
+        return await self.memory.rollback_memory(user_id, version)
+
+    async def update_memory(
+        self, user_id: str, message: str, message_id: Optional[str] = None
+    ):
+        await self.memory.update_memory(user_id, message, message_id)
 
-    async def update_memory(self, user_id: str, message: str):
-        await self.memory.update_memory(user_id, message)
+    async def batch_update_memory(
+        self,
+        user_id: str,
+        messages: List[Dict[str, str]],
+        message_ids: Optional[List[Optional[str]]] = None,
+    ):
+        await self.memory.batch_update_memory(user_id, messages, message_ids)
 
-    async def batch_update_memory(self, user_id: str, messages: List[Dict[str, str]]):
-        await self.memory.batch_update_memory(user_id, messages)
+    async def bulk_update_memory(
+        self,
+        conversations: Conversations,
+        max_concurrency: int = 16,
+        requests_per_second: Optional[float] = None,
+        max_retries: int = 3,
+        backoff: float = 1.0,
+        checkpoint_file: Optional[str] = None,
+    ) -> AsyncIterator[BulkUpdateResult]:
+        """Update memory for many users, yielding one result per conversation.
+
+        ``conversations`` is an iterable or async iterable of ``(user_id, messages)``
+        pairs, where ``messages`` is a single message or a conversation. Results
+        arrive in completion order, not input order.
+        """
+        ingestor = BulkIngestor(
+            self.memory,
+            max_concurrency=max_concurrency,
+            max_retries=max_retries,
+            backoff=backoff,
+            checkpoint_file=checkpoint_file,
+            rate_limiter=(
+                TokenBucket(requests_per_second)
+                if requests_per_second is not None
+                else None
+            ),
+        )
+        try:
+            async for result in ingestor.run(conversations):
+                yield result
+        finally:
+            await self.memory.flush()
 
     async def delete_memory(self, user_id: str) -> bool:
         return await self.memory.delete_memory(user_id)
 
-    async def get_beliefs(self, user_id: str) -> str:
-        return await self.memory.get_beliefs(user_id) or None
+    async def flush(self):
+        await self.memory.flush()
+
+    async def close(self):
+        """Finish background work and flush every pending change to storage."""
+        await self.memory.close()
+
+    def subscribe(
+        self, user_ids: Optional[Iterable[str]] = None, max_queue: int = 1000
+    ) -> Subscription:
+        """Stream ``MemoryChange`` events, optionally for some users only.
+
+        Use as ``async with manager.subscribe() as changes: async for change
+        in changes: ...``; the subscription stops when the block exits.
+        """
+        return self.memory.changes.subscribe(user_ids, max_queue)
+
+    def add_change_listener(self, listener: Callable[[MemoryChange], Any]):
+        self.memory.changes.add_listener(listener)
+
+    def remove_change_listener(self, listener: Callable[[MemoryChange], Any]):
+        self.memory.changes.remove_listener(listener)
+
+    async def compact_memory(self, user_id: str) -> int:
+        return await self.memory.compact_memory(user_id)
+
+    async def get_beliefs(self, user_id: str, fresh: bool = False) -> str:
+        return await self.memory.get_beliefs(user_id, fresh) or None
 
     async def get_memory_context(
-        self, user_id: str, message: Optional[str] = ""
+        self,
+        user_id: str,
+        message: Optional[str] = "",
+        max_tokens: Optional[int] = None,
     ) -> str:
-        return await self.memory.get_memory_context(user_id, message)
+        return await self.memory.get_memory_context(user_id, message, max_tokens)
 
 
 class MemoryManager(BaseMemoryManager):
@@ -395,27 +1758,74 @@ class MemoryManager(BaseMemoryManager):
             llm=self.llm,
             business_description=self.business_description,
             include_beliefs=self.include_beliefs,
+            **self.memory_options,
         )
 
-    def get_memory(self, user_id: str) -> str:
+    def get_memory(
+        self,
+        user_id: str,
+        as_of: Optional[AsOf] = None,
+        version: Optional[int] = None,
+    ) -> str:
         return (
-            asyncio.run(self.memory.get_memory(user_id))
+            self.memory.get_memory(user_id, as_of, version)
             or "No memory found for this user."
         )
 
-    def update_memory(self, user_id: str, message: str):
-        self.memory.update_memory(user_id, message)
+    def get_history(self, user_id: str) -> List[Dict[str, Any]]:
+        return self.memory.get_history(user_id)
+
+    def diff_memory(
+        self, user_id: str, from_version: int, to_version: Optional[int] = None
+    ) -> Dict[str, Dict]:
+        return self.memory.diff_memory(user_id, from_version, to_version)
+
+    def rollback_memory(self, user_id: str, version: int) -> Dict:
+        return self.memory.rollback_memory(user_id, version)
+
+    def update_memory(
+        self, user_id: str, message: str, message_id: Optional[str] = None
+    ):
+        self.memory.update_memory(user_id, message, message_id)
 
     def batch_update_memory(
-        self, user_id: str, messages: Union[List[BaseMessage], List[Dict[str, str]]]
+        self,
+        user_id: str,
+        messages: Union[List[BaseMessage], List[Dict[str, str]]],
+        message_ids: Optional[List[Optional[str]]] = None,
     ):
-        self.memory.batch_update_memory(user_id, messages)
+        self.memory.batch_update_memory(user_id, messages, message_ids)
 
     def delete_memory(self, user_id: str) -> bool:
         return self.memory.delete_memory(user_id)
 
-    def get_beliefs(self, user_id: str) -> str:
-        return self.memory.get_beliefs(user_id) or None
+    def flush(self):
+        self.memory.flush()
+
+    def close(self):
+        self.memory.close()
+
+    def add_change_listener(self, listener: Callable[[MemoryChange], Any]):
+        """Call ``listener`` with every ``MemoryChange``.
+
+        Listeners run on the background event loop thread and should hand
+        heavy work off rather than block it.
+        """
+        self.memory.changes.add_listener(listener)
 
-    def get_memory_context(self, user_id: str, message: Optional[str] = "") -> str:
-        return self.memory.get_memory_context(user_id, message)
+    def remove_change_listener(self, listener: Callable[[MemoryChange], Any]):
+        self.memory.changes.remove_listener(listener)
+
+    def compact_memory(self, user_id: str) -> int:
+        return self.memory.compact_memory(user_id)
+
+    def get_beliefs(self, user_id: str, fresh: bool = False) -> str:
+        return self.memory.get_beliefs(user_id, fresh) or None
+
+    def get_memory_context(
+        self,
+        user_id: str,
+        message: Optional[str] = "",
+        max_tokens: Optional[int] = None,
+    ) -> str:
+        return self.memory.get_memory_context(user_id, message, max_tokens)
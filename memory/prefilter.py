@@ -0,0 +1,71 @@
+import re
+from typing import Callable, Dict, FrozenSet, Iterable, Optional
+
+# Words that make up acknowledgements, greetings and reactions. A message made
+# only of these carries nothing worth remembering.
+FILLER_WORDS = frozenset("""
+    ah alright anytime appreciate appreciated awesome bye cheers cool day
+    done evening excellent fine for gn good goodbye got great hello hey hi
+    hmm hmmm it k kk later lmao lol morning much nice night no nope np oh ok
+    okay perfect please right see so sounds super sure thank thanks that
+    the thx too ty tysm very welcome wow ya yay yeah yep yes you
+    """.split())
+FIRST_PERSON_WORDS = frozenset(
+    "i i'm im i've ive i'd id i'll me my mine myself we we're our ours us".split()
+)
+WORD_PATTERN = re.compile(r"[^\W_]+(?:'[^\W_]+)?")
+LAUGHTER_PATTERN = re.compile(r"^(?:(?:ha|he|ah)+h?|(?:lo)+l)$")
+
+
+class MessagePrefilter:
+    """Decides locally, without an LLM call, whether a message may hold facts.
+
+    Messages with no words at all (emoji, punctuation), and messages made only
+    of acknowledgements, greetings and laughter are skipped. With
+    ``require_self_reference`` messages that never mention the user (``I``,
+    ``my``, ``we``...) are skipped as well. ``classifier`` is an optional
+    local model called on messages that pass the rules: a callable returning
+    the probability that the message holds personal information, which is
+    skipped below ``threshold``.
+    """
+
+    def __init__(
+        self,
+        filler_words: Iterable[str] = FILLER_WORDS,
+        require_self_reference: bool = False,
+        classifier: Optional[Callable[[str], float]] = None,
+        threshold: float = 0.5,
+    ):
+        self.filler_words: FrozenSet[str] = frozenset(filler_words)
+        self.require_self_reference = require_self_reference
+        self.classifier = classifier
+        self.threshold = threshold
+        self.checked = 0
+        self.skipped = 0
+
+    def should_extract(self, *messages: str) -> bool:
+        """Whether any of ``messages`` may hold facts; counts as one check."""
+        self.checked += 1
+        if any(self._may_hold_facts(message) for message in messages):
+            return True
+        self.skipped += 1
+        return False
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "checked": self.checked,
+            "skipped": self.skipped,
+            "skip_ratio": self.skipped / self.checked if self.checked else 0.0,
+        }
+
+    def _may_hold_facts(self, message: str) -> bool:
+        words = WORD_PATTERN.findall(message.casefold())
+        if all(
+            word in self.filler_words or LAUGHTER_PATTERN.match(word) for word in words
+        ):
+            return False
+        if self.require_self_reference and not FIRST_PERSON_WORDS.intersection(words):
+            return False
+        if self.classifier is not None:
+            return self.classifier(message) >= self.threshold
+        return True
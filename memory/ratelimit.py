@@ -0,0 +1,42 @@
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+
+class TokenBucket:
+    """Async token-bucket rate limiter.
+
+    Tokens refill continuously at ``rate`` per second up to ``capacity``;
+    ``acquire`` waits until enough tokens are available. Share one instance
+    between every memory object that talks to the same provider account.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError(f"rate must be positive, got {rate=}")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: float = 1.0):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated_at) * self.rate
+                )
+                self._updated_at = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+
+# Limiter of the bulk run the current task belongs to. It throttles only the
+# LLM calls made on behalf of that run, on top of the memory's own limiter.
+run_rate_limiter: ContextVar[Optional[TokenBucket]] = ContextVar(
+    "run_rate_limiter", default=None
+)
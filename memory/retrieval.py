@@ -0,0 +1,177 @@
+import re
+import zlib
+from abc import ABC, abstractmethod
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .cache import LRUCache
+
+# Rough characters-per-token ratio used for token budgets without depending
+# on a provider-specific tokenizer.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+STOP_WORDS = frozenset(
+    "a an and any are as at be do does for from have i in is it me my of on or "
+    "our the to was what when where which who with you your".split()
+)
+
+
+class BaseEmbedder(ABC):
+    """Turns texts into vectors and scores stored vectors against a query.
+
+    The default implementation treats ``embed`` output as dense, L2-normalized
+    rows, so a dense embedder only needs to implement ``embed``.
+    """
+
+    @abstractmethod
+    def embed(self, texts: Sequence[str]) -> Sequence[Any]:
+        pass
+
+    def stack(self, vectors: Sequence[Any]) -> Any:
+        return np.stack(vectors)
+
+    def scores(self, matrix: Any, query: Any) -> np.ndarray:
+        return matrix @ query
+
+
+class HashingEmbedder(BaseEmbedder):
+    """Embeds text with the hashing trick, without any model or network call.
+
+    Content words and their character trigrams are hashed into ``dim`` buckets
+    and weighted by sublinear term frequency, so entries like ``pets: dog
+    named Charlie`` match queries such as ``any ideas for my dogs?``. Vectors
+    are kept sparse as (sorted buckets, weights) pairs, which keeps collisions
+    rare without paying for ``dim`` floats per entry.
+    """
+
+    def __init__(self, dim: int = 2**20, char_ngrams: int = 3):
+        self.dim = dim
+        self.char_ngrams = char_ngrams
+
+    def features(self, text: str) -> List[str]:
+        features = []
+        for word in re.findall(r"\w+", text.lower()):
+            if word in STOP_WORDS:
+                continue
+            if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+                word = word[:-1]
+            features.append(word)
+            padded = f" {word} "
+            features.extend(
+                padded[i : i + self.char_ngrams]
+                for i in range(len(padded) - self.char_ngrams + 1)
+            )
+        return features
+
+    def embed(self, texts: Sequence[str]) -> List[Tuple[np.ndarray, np.ndarray]]:
+        vectors = []
+        for text in texts:
+            # crc32 rather than ``hash`` so vectors are stable across runs.
+            hashed = [
+                zlib.crc32(feature.encode()) % self.dim
+                for feature in self.features(text)
+            ]
+            buckets, counts = np.unique(
+                np.array(hashed, dtype=np.int64), return_counts=True
+            )
+            weights = np.log1p(counts).astype(np.float32)
+            norm = np.linalg.norm(weights)
+            vectors.append((buckets, weights / norm if norm else weights))
+        return vectors
+
+    def stack(self, vectors: Sequence[Tuple[np.ndarray, np.ndarray]]):
+        lengths = [len(buckets) for buckets, _ in vectors]
+        return (
+            np.repeat(np.arange(len(vectors)), lengths),
+            np.concatenate([buckets for buckets, _ in vectors]),
+            np.concatenate([weights for _, weights in vectors]),
+        )
+
+    def scores(self, matrix, query: Tuple[np.ndarray, np.ndarray]) -> np.ndarray:
+        rows, buckets, weights = matrix
+        query_buckets, query_weights = query
+        count = int(rows[-1]) + 1 if len(rows) else 0
+        if not len(query_buckets):
+            return np.zeros(count, dtype=np.float32)
+
+        positions = np.minimum(
+            np.searchsorted(query_buckets, buckets), len(query_buckets) - 1
+        )
+        products = np.where(
+            query_buckets[positions] == buckets, weights * query_weights[positions], 0
+        )
+        return np.bincount(rows, products, minlength=count)
+
+
+class MemoryIndex:
+    """Per-user vector index over rendered memory entries.
+
+    Entries are re-embedded only when their text changes, and indexes for the
+    ``max_users`` most recently queried users are kept in an LRU.
+    """
+
+    def __init__(
+        self, embedder: Optional[BaseEmbedder] = None, max_users: Optional[int] = 10_000
+    ):
+        self.embedder = embedder or HashingEmbedder()
+        self._indexes = LRUCache(max_entries=max_users)
+
+    def _index(self, user_id: str, entries: List[str]) -> Any:
+        cached = self._indexes.get(user_id)
+        if cached is not None and cached[0] == entries:
+            return cached[2]
+
+        known = dict(zip(cached[0], cached[1])) if cached is not None else {}
+        missing = [entry for entry in entries if entry not in known]
+        if missing:
+            known.update(zip(missing, self.embedder.embed(missing)))
+        vectors = [known[entry] for entry in entries]
+        matrix = self.embedder.stack(vectors)
+        self._indexes.put(user_id, (entries, vectors, matrix))
+        return matrix
+
+    def search(
+        self,
+        user_id: str,
+        entries: List[str],
+        query: str,
+        top_k: int = 8,
+        max_tokens: Optional[int] = None,
+        fallback: Sequence[str] = (),
+    ) -> List[str]:
+        """Return up to ``top_k`` entries relevant to ``query``, best first.
+
+        Slots left when fewer entries match ``query`` are filled from
+        ``fallback`` in order, e.g. entries ranked by priority and recency.
+        """
+        if not entries:
+            return []
+
+        matrix = self._index(user_id, entries)
+        scores = self.embedder.scores(matrix, self.embedder.embed([query])[0])
+        candidates = [
+            entries[position]
+            for position in np.argsort(-scores, kind="stable")
+            if scores[position] > 0
+        ]
+        matched = set(candidates)
+        candidates.extend(entry for entry in fallback if entry not in matched)
+        results, used = [], 0
+        for entry in candidates:
+            if len(results) == top_k:
+                break
+            tokens = estimate_tokens(entry)
+            if max_tokens is not None and used + tokens > max_tokens:
+                continue
+            results.append(entry)
+            used += tokens
+        return results
+
+    def invalidate(self, user_id: str):
+        self._indexes.pop(user_id)
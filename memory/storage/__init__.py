@@ -0,0 +1,11 @@
+from .base import BaseStorage, WriteConflictError
+from .indexed import IndexedSnapshot, IndexedSnapshotStorage
+from .json_storage import JSONFileStorage
+from .serializers import (
+    BaseSerializer,
+    JSONSerializer,
+    MsgpackSerializer,
+    OrjsonSerializer,
+)
+from .sqlite_storage import SQLiteStorage
+from .wal import WriteAheadLog
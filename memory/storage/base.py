@@ -0,0 +1,68 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional
+
+
+class WriteConflictError(Exception):
+    """A record changed in storage since this process last read it."""
+
+    def __init__(self, user_ids: Iterable[str]):
+        self.user_ids = list(user_ids)
+        super().__init__(
+            f"Memory of {', '.join(self.user_ids)} was changed by another writer"
+        )
+
+
+class BaseStorage(ABC):
+    """Per-user persistence for memory records.
+
+    Implementations only ever read or write the record of the user they are
+    asked about, so callers never have to hold the whole dataset in memory.
+
+    Backends that several processes may write at once set ``shared`` and
+    raise ``WriteConflictError`` from ``put``/``put_many`` when the stored
+    record changed since it was last read through them, instead of
+    overwriting the other writer's changes.
+    """
+
+    # Total bytes handed to the OS or database, for instrumentation.
+    bytes_written: int = 0
+    shared: bool = False
+
+    @abstractmethod
+    async def get(self, user_id: str) -> Optional[Dict]:
+        pass
+
+    @abstractmethod
+    async def put(self, user_id: str, record: Dict):
+        pass
+
+    @abstractmethod
+    async def delete(self, user_id: str) -> bool:
+        pass
+
+    @abstractmethod
+    async def list_users(self) -> List[str]:
+        pass
+
+    async def put_many(self, records: Dict[str, Optional[Dict]]):
+        """Write several records in one go; a ``None`` record deletes the user."""
+        for user_id, record in records.items():
+            if record is None:
+                await self.delete(user_id)
+            else:
+                await self.put(user_id, record)
+
+    async def is_current(self, user_id: str) -> bool:
+        """Whether the user's record is unchanged since it was last read or
+        written through this instance; only ``shared`` backends can say no."""
+        return True
+
+    async def sync(self):
+        """Make every write so far durable on disk, for backends that defer it."""
+        pass
+
+    async def wait_for_background_tasks(self):
+        pass
+
+    async def close(self):
+        pass
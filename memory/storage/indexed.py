@@ -0,0 +1,286 @@
+import asyncio
+import hashlib
+import heapq
+import mmap
+import os
+import struct
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from .base import BaseStorage
+from .serializers import BaseSerializer, get_serializer, load_any
+from .wal import WriteAheadLog
+
+# File layout: a header, an index of fixed-size entries sorted by the 64-bit
+# hash of the user id, then one blob per user holding the length-prefixed
+# user id followed by the serialized record.
+MAGIC = b"TVNIDX01"
+HEADER = struct.Struct("<8sQ")  # magic, number of users
+ENTRY = struct.Struct("<QQI")  # user id hash, blob offset, blob length
+NAME_LENGTH = struct.Struct("<H")
+
+
+def key_hash(user_id: str) -> int:
+    # Stable across processes, unlike hash(), since it is persisted.
+    digest = hashlib.blake2b(user_id.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class IndexedSnapshot:
+    """Read-only, memory-mapped view of an indexed snapshot file.
+
+    Opening only maps the file. A lookup binary-searches the index and
+    decodes the one record it finds, so cold start does not depend on the
+    number of users, and forked workers share the pages through the OS page
+    cache instead of each holding a parsed copy.
+    """
+
+    def __init__(self, path: str, serializer: Union[str, BaseSerializer] = "json"):
+        self.path = path
+        self.serializer = get_serializer(serializer)
+        self._mmap = None
+        self._count = 0
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, self._count = HEADER.unpack_from(self._mmap, 0)
+            if magic != MAGIC:
+                self.close()
+                raise ValueError(f"{path} is not an indexed memory snapshot")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, user_id: str) -> bool:
+        return self._find(user_id) is not None
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+            self._count = 0
+
+    def get(self, user_id: str) -> Optional[Dict]:
+        found = self._find(user_id)
+        if found is None:
+            return None
+        offset, length = found
+        name_length = NAME_LENGTH.unpack_from(self._mmap, offset)[0]
+        start = offset + NAME_LENGTH.size + name_length
+        return load_any(self._mmap[start : offset + length], self.serializer)
+
+    def entries(self) -> Iterator[Tuple[int, int, int]]:
+        for i in range(self._count):
+            yield self._entry(i)
+
+    def user_ids(self) -> Iterator[str]:
+        for _, offset, _ in self.entries():
+            yield self._name(offset)
+
+    def blob(self, offset: int, length: int) -> bytes:
+        return self._mmap[offset : offset + length]
+
+    def _entry(self, i: int) -> Tuple[int, int, int]:
+        return ENTRY.unpack_from(self._mmap, HEADER.size + i * ENTRY.size)
+
+    def _name(self, offset: int) -> str:
+        name_length = NAME_LENGTH.unpack_from(self._mmap, offset)[0]
+        start = offset + NAME_LENGTH.size
+        return self._mmap[start : start + name_length].decode()
+
+    def _find(self, user_id: str) -> Optional[Tuple[int, int]]:
+        target = key_hash(user_id)
+        low, high = 0, self._count
+        while low < high:
+            mid = (low + high) // 2
+            if self._entry(mid)[0] < target:
+                low = mid + 1
+            else:
+                high = mid
+        # Distinct user ids can share a hash; they sit next to each other.
+        for i in range(low, self._count):
+            entry_hash, offset, length = self._entry(i)
+            if entry_hash != target:
+                break
+            if self._name(offset) == user_id:
+                return offset, length
+        return None
+
+
+def write_indexed_snapshot(
+    path: str,
+    base: Optional[IndexedSnapshot],
+    changes: Dict[str, Optional[Dict]],
+    serializer: BaseSerializer,
+) -> None:
+    """Write ``base`` with ``changes`` applied (None deletes) to ``path``.
+
+    Unchanged records are copied from ``base`` as raw bytes without being
+    decoded. The file is written to a temp file, synced and renamed into
+    place.
+    """
+    replaced = set()
+    new_entries: List[Tuple[int, bytes]] = []
+    for user_id, record in changes.items():
+        if base is not None:
+            found = base._find(user_id)
+            if found is not None:
+                replaced.add(found[0])
+        if record is not None:
+            name = user_id.encode()
+            blob = NAME_LENGTH.pack(len(name)) + name + serializer.dumps(record)
+            new_entries.append((key_hash(user_id), blob))
+    new_entries.sort(key=lambda entry: entry[0])
+
+    def merged() -> Iterator[Tuple[int, int, Union[int, bytes]]]:
+        # (hash, blob length, base offset or new blob), in hash order.
+        kept = (
+            (entry_hash, length, offset)
+            for entry_hash, offset, length in (base.entries() if base else ())
+            if offset not in replaced
+        )
+        added = ((entry_hash, len(blob), blob) for entry_hash, blob in new_entries)
+        return heapq.merge(kept, added, key=lambda entry: entry[0])
+
+    count = (len(base) if base else 0) - len(replaced) + len(new_entries)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, count))
+        offset = HEADER.size + count * ENTRY.size
+        for entry_hash, length, _ in merged():
+            f.write(ENTRY.pack(entry_hash, offset, length))
+            offset += length
+        for _, length, source in merged():
+            f.write(source if isinstance(source, bytes) else base.blob(source, length))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class IndexedSnapshotStorage(BaseStorage):
+    """Indexed, memory-mapped snapshot with a change log layered on top.
+
+    Startup maps the snapshot and replays only the change log; records are
+    decoded from the snapshot when they are first read. Writes are appended to
+    the log, and once ``compaction_threshold`` records have been logged the
+    log is folded into a new snapshot in the background, copying unchanged
+    records byte for byte.
+    """
+
+    def __init__(
+        self,
+        snapshot_file: str = "memory.idx",
+        log_file: Optional[str] = None,
+        compaction_threshold: int = 10_000,
+        serializer: Union[str, BaseSerializer] = "json",
+        fsync: bool = False,
+    ):
+        self.snapshot_file = snapshot_file
+        self.serializer = get_serializer(serializer)
+        self._wal = WriteAheadLog(
+            snapshot_file,
+            log_file=log_file,
+            compaction_threshold=compaction_threshold,
+            fsync=fsync,
+            serializer=self.serializer,
+        )
+        self._snapshot: Optional[IndexedSnapshot] = None
+        # Changes not yet folded into the snapshot; None marks a deletion.
+        self._changes: Dict[str, Optional[Dict]] = {}
+        self._snapshot_bytes_written = 0
+        self._load_lock = asyncio.Lock()
+        self._compaction_task = None
+
+    @property
+    def bytes_written(self) -> int:
+        return self._snapshot_bytes_written + self._wal.bytes_written
+
+    async def get(self, user_id: str) -> Optional[Dict]:
+        await self._ensure_loaded()
+        if user_id in self._changes:
+            return self._changes[user_id]
+        return self._snapshot.get(user_id)
+
+    async def put(self, user_id: str, record: Dict):
+        await self.put_many({user_id: record})
+
+    async def put_many(self, records: Dict[str, Optional[Dict]]):
+        await self._ensure_loaded()
+        self._changes.update(records)
+        await self._wal.append_many(records)
+        if self._wal.needs_compaction() and not self._compaction_task:
+            self._compaction_task = asyncio.create_task(self._compact())
+
+    async def delete(self, user_id: str) -> bool:
+        if await self.get(user_id) is None:
+            return False
+        await self.put_many({user_id: None})
+        return True
+
+    async def list_users(self) -> List[str]:
+        await self._ensure_loaded()
+        users = [
+            user_id
+            for user_id in self._snapshot.user_ids()
+            if user_id not in self._changes
+        ]
+        return users + [u for u, record in self._changes.items() if record is not None]
+
+    async def import_from(self, source: BaseStorage):
+        """Copy every user of ``source`` (e.g. a ``JSONFileStorage``) in here."""
+        records = {
+            user_id: await source.get(user_id) for user_id in await source.list_users()
+        }
+        await self.put_many(records)
+        await self.compact()
+
+    async def compact(self):
+        """Fold the change log into a new snapshot now."""
+        await self.wait_for_background_tasks()
+        await self._ensure_loaded()
+        await self._compact()
+
+    async def wait_for_background_tasks(self):
+        if self._compaction_task:
+            await self._compaction_task
+
+    async def close(self):
+        await self.wait_for_background_tasks()
+        if self._snapshot is not None:
+            self._snapshot.close()
+            self._snapshot = None
+            self._changes = {}
+
+    async def _ensure_loaded(self):
+        if self._snapshot is not None:
+            return
+        async with self._load_lock:
+            if self._snapshot is None:
+                self._changes = await self._wal.replay()
+                self._snapshot = IndexedSnapshot(self.snapshot_file, self.serializer)
+
+    async def _compact(self):
+        folded = {}
+
+        def prepare():
+            folded.update(self._changes)
+            return asyncio.to_thread(
+                write_indexed_snapshot,
+                self.snapshot_file,
+                self._snapshot,
+                folded,
+                self.serializer,
+            )
+
+        try:
+            await self._wal.checkpoint(prepare)
+            self._snapshot_bytes_written += os.path.getsize(self.snapshot_file)
+            previous, self._snapshot = self._snapshot, IndexedSnapshot(
+                self.snapshot_file, self.serializer
+            )
+            previous.close()
+            for user_id, record in folded.items():
+                # Keep changes that were made while the snapshot was written.
+                if user_id in self._changes and self._changes[user_id] is record:
+                    del self._changes[user_id]
+        finally:
+            self._compaction_task = None
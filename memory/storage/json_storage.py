@@ -0,0 +1,154 @@
+import asyncio
+import os
+from typing import Dict, Iterable, List, Optional, Union
+
+import aiofiles
+
+from .base import BaseStorage
+from .serializers import BaseSerializer, detect_format, get_serializer, load_any
+from .wal import WriteAheadLog, atomic_write, sync_file
+
+PERSISTENCE_MODES = ("snapshot", "log")
+
+
+class JSONFileStorage(BaseStorage):
+    """Stores every user in a single JSON file.
+
+    The file is parsed on first access and every record stays in memory, so
+    the memory's ``cache_max_entries``/``cache_max_bytes`` do not bound its
+    footprint; use ``SQLiteStorage`` or ``IndexedSnapshotStorage`` for that.
+    In ``"snapshot"`` mode each write atomically replaces the file, which is
+    synced to disk by ``put_many`` (group-commit flushes), ``sync`` and
+    ``close`` rather than on every write; in ``"log"`` mode writes are
+    appended to a change log that is compacted into the snapshot in the
+    background.
+    Records returned by ``get`` are the live stored objects, not copies.
+
+    The file is encoded with ``serializer`` (``"json"``, ``"orjson"``,
+    ``"msgpack"`` or a ``BaseSerializer``). The format of an existing file is
+    detected on load, and a file in another format is migrated in place.
+    """
+
+    def __init__(
+        self,
+        memory_file: str = "memory.json",
+        persistence: str = "snapshot",
+        log_compaction_threshold: int = 1000,
+        serializer: Union[str, BaseSerializer] = "json",
+    ):
+        if persistence not in PERSISTENCE_MODES:
+            raise ValueError(
+                f"Unsupported {persistence=}. Supported modes are: "
+                f"{', '.join(PERSISTENCE_MODES)}"
+            )
+        self.memory_file = memory_file
+        self.persistence = persistence
+        self.serializer = get_serializer(serializer)
+        self.memory = {}
+        self._wal = (
+            WriteAheadLog(
+                memory_file,
+                compaction_threshold=log_compaction_threshold,
+                serializer=self.serializer,
+            )
+            if persistence == "log"
+            else None
+        )
+        self._snapshot_bytes_written = 0
+        self._snapshot_synced = True
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+        self._save_lock = asyncio.Lock()
+        self._compaction_task = None
+
+    @property
+    def bytes_written(self) -> int:
+        wal_bytes_written = self._wal.bytes_written if self._wal else 0
+        return self._snapshot_bytes_written + wal_bytes_written
+
+    async def get(self, user_id: str) -> Optional[Dict]:
+        await self._ensure_loaded()
+        return self.memory.get(user_id)
+
+    async def put(self, user_id: str, record: Dict):
+        await self._ensure_loaded()
+        self.memory[user_id] = record
+        await self._save([user_id])
+
+    async def delete(self, user_id: str) -> bool:
+        await self._ensure_loaded()
+        if user_id not in self.memory:
+            return False
+        del self.memory[user_id]
+        await self._save([user_id])
+        return True
+
+    async def put_many(self, records: Dict[str, Optional[Dict]]):
+        await self._ensure_loaded()
+        for user_id, record in records.items():
+            if record is None:
+                self.memory.pop(user_id, None)
+            else:
+                self.memory[user_id] = record
+        await self._save(records, fsync=True)
+
+    async def list_users(self) -> List[str]:
+        await self._ensure_loaded()
+        return list(self.memory)
+
+    async def wait_for_background_tasks(self):
+        if self._compaction_task:
+            await self._compaction_task
+
+    async def sync(self):
+        async with self._save_lock:
+            if not self._snapshot_synced:
+                await sync_file(self.memory_file)
+                self._snapshot_synced = True
+
+    async def close(self):
+        await self.wait_for_background_tasks()
+        await self.sync()
+
+    async def _ensure_loaded(self):
+        if self._loaded:
+            return
+        async with self._load_lock:
+            if not self._loaded:
+                self.memory = await self._load()
+                self._loaded = True
+
+    async def _load(self) -> Dict[str, Dict]:
+        if self._wal:
+            return await self._wal.load()
+        if not os.path.exists(self.memory_file):
+            return {}
+        async with aiofiles.open(self.memory_file, "rb") as f:
+            content = await f.read()
+        memory = load_any(content, self.serializer) if content else {}
+        if content and detect_format(content) != self.serializer.format:
+            await self._write_snapshot(self.serializer.dumps(memory))
+        return memory
+
+    async def _save(self, user_ids: Iterable[str], fsync: bool = False):
+        if self._wal:
+            await self._wal.append_many(
+                {user_id: self.memory.get(user_id) for user_id in user_ids}
+            )
+            if self._wal.needs_compaction() and not self._compaction_task:
+                self._compaction_task = asyncio.create_task(self._compact())
+            return
+
+        await self._write_snapshot(self.serializer.dumps(self.memory), fsync)
+
+    async def _write_snapshot(self, content: bytes, fsync: bool = True):
+        async with self._save_lock:
+            await atomic_write(self.memory_file, content, fsync)
+            self._snapshot_bytes_written += len(content)
+            self._snapshot_synced = fsync
+
+    async def _compact(self):
+        try:
+            await self._wal.compact(self.memory)
+        finally:
+            self._compaction_task = None
@@ -0,0 +1,124 @@
+import importlib.util
+import json
+from abc import ABC, abstractmethod
+from typing import Any, Union
+
+
+class BaseSerializer(ABC):
+    """Turns stored records into bytes and back.
+
+    ``format`` names the on-disk encoding; data written in another supported
+    format is still readable, and files are migrated when the format changes.
+    Change-log lines are always single-line JSON, so a torn final line can be
+    told apart from a complete one.
+    """
+
+    format: str = "json"
+
+    @abstractmethod
+    def dumps(self, value: Any) -> bytes:
+        pass
+
+    @abstractmethod
+    def loads(self, data: bytes) -> Any:
+        pass
+
+    def dumps_line(self, value: Any) -> bytes:
+        return json.dumps(value, separators=(",", ":")).encode()
+
+    def loads_line(self, line: bytes) -> Any:
+        return json.loads(line)
+
+
+class JSONSerializer(BaseSerializer):
+    """Standard-library JSON, compact unless ``indent`` is given."""
+
+    def __init__(self, indent: Union[int, None] = None):
+        self.indent = indent
+
+    def dumps(self, value: Any) -> bytes:
+        separators = (",", ":") if self.indent is None else None
+        return json.dumps(value, indent=self.indent, separators=separators).encode()
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+def _require(package: str):
+    if not importlib.util.find_spec(package):
+        raise ImportError(
+            f"Unable to import {package}. Please install with "
+            f"`pip install -U {package}`"
+        )
+
+
+class OrjsonSerializer(BaseSerializer):
+    """Compact JSON through ``orjson``; requires the ``orjson`` package."""
+
+    def __init__(self):
+        _require("orjson")
+        import orjson
+
+        self._orjson = orjson
+
+    def dumps(self, value: Any) -> bytes:
+        return self._orjson.dumps(value)
+
+    def loads(self, data: bytes) -> Any:
+        return self._orjson.loads(data)
+
+    def dumps_line(self, value: Any) -> bytes:
+        return self._orjson.dumps(value)
+
+    def loads_line(self, line: bytes) -> Any:
+        return self._orjson.loads(line)
+
+
+class MsgpackSerializer(BaseSerializer):
+    """Binary MessagePack; requires the ``msgpack`` package."""
+
+    format = "msgpack"
+
+    def __init__(self):
+        _require("msgpack")
+        import msgpack
+
+        self._msgpack = msgpack
+
+    def dumps(self, value: Any) -> bytes:
+        return self._msgpack.packb(value, use_bin_type=True)
+
+    def loads(self, data: bytes) -> Any:
+        return self._msgpack.unpackb(data, raw=False)
+
+
+SERIALIZERS = {
+    "json": JSONSerializer,
+    "orjson": OrjsonSerializer,
+    "msgpack": MsgpackSerializer,
+}
+
+
+def get_serializer(serializer: Union[str, BaseSerializer]) -> BaseSerializer:
+    if isinstance(serializer, BaseSerializer):
+        return serializer
+    if serializer not in SERIALIZERS:
+        raise ValueError(
+            f"Unsupported {serializer=}. Supported serializers are: "
+            f"{', '.join(SERIALIZERS)}"
+        )
+    return SERIALIZERS[serializer]()
+
+
+def detect_format(data: bytes) -> str:
+    # A stored dataset or record is a JSON object, which starts with "{" after
+    # optional whitespace; a MessagePack map starts with a byte >= 0x80.
+    stripped = data.lstrip()
+    return "json" if not stripped or stripped[:1] == b"{" else "msgpack"
+
+
+def load_any(data: bytes, serializer: BaseSerializer) -> Any:
+    """Decode ``data`` written in any supported format."""
+    if detect_format(data) == serializer.format:
+        return serializer.loads(data)
+    return get_serializer(detect_format(data)).loads(data)
@@ -0,0 +1,177 @@
+import asyncio
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Union
+
+from ..cache import LRUCache
+from .base import BaseStorage, WriteConflictError
+from .serializers import BaseSerializer, get_serializer, load_any
+
+
+class SQLiteStorage(BaseStorage):
+    """Stores one row per user in an embedded SQLite database.
+
+    The database runs in WAL journal mode, so several worker processes can
+    read and write the same file concurrently. Every row carries a version:
+    a write only succeeds if the row is still at the version this instance
+    last read or wrote, and raises ``WriteConflictError`` otherwise, so
+    concurrent writers never silently overwrite each other. Queries run in a
+    worker thread to keep the event loop responsive. Rows written with
+    another serializer stay readable and are converted as their users are
+    next saved.
+    """
+
+    shared = True
+
+    def __init__(
+        self,
+        db_file: str = "memory.db",
+        timeout: float = 30.0,
+        serializer: Union[str, BaseSerializer] = "json",
+        max_tracked_versions: Optional[int] = 100_000,
+    ):
+        self.db_file = db_file
+        self.timeout = timeout
+        self.serializer = get_serializer(serializer)
+        self._conn = None
+        self._lock = threading.Lock()
+        # Row versions last seen by this instance; 0 means "no row". A user
+        # whose version was evicted is treated as unseen, so writing it
+        # conflicts and the caller re-reads it.
+        self._versions = LRUCache(max_entries=max_tracked_versions)
+
+    async def get(self, user_id: str) -> Optional[Dict]:
+        row = await asyncio.to_thread(self._get_sync, user_id)
+        return self._decode(row[0]) if row else None
+
+    async def put(self, user_id: str, record: Dict):
+        await self.put_many({user_id: record})
+
+    async def is_current(self, user_id: str) -> bool:
+        return await asyncio.to_thread(self._is_current_sync, user_id)
+
+    async def delete(self, user_id: str) -> bool:
+        existed = await self.get(user_id) is not None
+        await self.put_many({user_id: None})
+        return existed
+
+    async def put_many(self, records: Dict[str, Optional[Dict]]):
+        payloads = {
+            user_id: self._encode(record) if record is not None else None
+            for user_id, record in records.items()
+        }
+        await asyncio.to_thread(self._put_many_sync, payloads)
+        self.bytes_written += sum(len(p) for p in payloads.values() if p is not None)
+
+    def _encode(self, record: Dict):
+        payload = self.serializer.dumps(record)
+        # JSON is kept as TEXT so the table stays readable with the sqlite3 CLI.
+        return payload.decode() if self.serializer.format == "json" else payload
+
+    def _decode(self, payload):
+        if isinstance(payload, str):
+            payload = payload.encode()
+        return load_any(payload, self.serializer)
+
+    def _get_sync(self, user_id: str):
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT record, version FROM memory WHERE user_id = ?", (user_id,)
+                )
+                .fetchone()
+            )
+            self._versions.put(user_id, row[1] if row else 0)
+            return row
+
+    def _is_current_sync(self, user_id: str) -> bool:
+        with self._lock:
+            row = (
+                self._connect()
+                .execute("SELECT version FROM memory WHERE user_id = ?", (user_id,))
+                .fetchone()
+            )
+            return self._versions.peek(user_id) == (row[0] if row else 0)
+
+    def _put_many_sync(self, payloads: Dict[str, Optional[str]]):
+        with self._lock:
+            conn = self._connect()
+            written, conflicts = {}, []
+            # All or nothing: a conflicting row rolls back the whole batch.
+            with conn:
+                for user_id, payload in payloads.items():
+                    version = self._versions.peek(user_id) or 0
+                    if payload is None:
+                        conn.execute("DELETE FROM memory WHERE user_id = ?", (user_id,))
+                        written[user_id] = 0
+                        continue
+                    if version:
+                        cursor = conn.execute(
+                            "UPDATE memory SET record = ?, version = version + 1 "
+                            "WHERE user_id = ? AND version = ?",
+                            (payload, user_id, version),
+                        )
+                    else:
+                        cursor = conn.execute(
+                            "INSERT INTO memory (user_id, record, version) "
+                            "VALUES (?, ?, 1) ON CONFLICT(user_id) DO NOTHING",
+                            (user_id, payload),
+                        )
+                    if cursor.rowcount:
+                        written[user_id] = version + 1
+                    else:
+                        conflicts.append(user_id)
+                if conflicts:
+                    raise WriteConflictError(conflicts)
+            for user_id, version in written.items():
+                self._versions.put(user_id, version)
+
+    async def list_users(self) -> List[str]:
+        rows = await self._execute("SELECT user_id FROM memory", fetch_all=True)
+        return [row[0] for row in rows]
+
+    async def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    async def _execute(
+        self, sql: str, params: tuple = (), fetch: bool = False, fetch_all: bool = False
+    ):
+        return await asyncio.to_thread(
+            self._execute_sync, sql, params, fetch, fetch_all
+        )
+
+    def _execute_sync(self, sql: str, params: tuple, fetch: bool, fetch_all: bool):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                cursor = conn.execute(sql, params)
+                if fetch:
+                    return cursor.fetchone()
+                if fetch_all:
+                    return cursor.fetchall()
+                return cursor.rowcount
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(
+                self.db_file, timeout=self.timeout, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS memory (user_id TEXT PRIMARY KEY, "
+                "record TEXT NOT NULL, version INTEGER NOT NULL DEFAULT 1)"
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(memory)")]
+            if "version" not in columns:
+                # Databases created before rows were versioned.
+                conn.execute(
+                    "ALTER TABLE memory ADD COLUMN version INTEGER NOT NULL DEFAULT 1"
+                )
+                conn.commit()
+            self._conn = conn
+        return self._conn
@@ -0,0 +1,78 @@
+import asyncio
+
+from benchmarks.fake_llm import ScriptedChatModel
+from memory.beliefs import BeliefScheduler
+from memory.memory import BaseAsyncMemory
+
+
+def test_belief_scheduler_coalesces_changes() -> None:
+    regenerated = []
+
+    async def regenerate(user_id: str):
+        regenerated.append(user_id)
+
+    async def run():
+        scheduler = BeliefScheduler(
+            regenerate, quiet_period=0.05, max_pending_changes=3
+        )
+        for _ in range(2):
+            scheduler.schedule("a")
+        scheduler.schedule("b")
+        assert regenerated == []
+
+        await asyncio.sleep(0.1)
+        assert sorted(regenerated) == ["a", "b"]
+
+        for _ in range(3):
+            scheduler.schedule("a")
+        await asyncio.sleep(0)
+        assert regenerated[-1] == "a" and len(regenerated) == 3
+
+        scheduler.schedule("b")
+        await scheduler.wait("b")
+        assert len(regenerated) == 4 and not scheduler.is_pending("b")
+
+    asyncio.run(run())
+
+
+def test_belief_scheduler_logs_failed_regenerations(caplog) -> None:
+    async def regenerate(user_id: str):
+        raise RuntimeError("provider unavailable")
+
+    async def run():
+        scheduler = BeliefScheduler(regenerate, quiet_period=0.01)
+        scheduler.schedule("a")
+        await asyncio.sleep(0.05)
+        scheduler.schedule("a")
+        await scheduler.wait("a")
+        await scheduler.flush()
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert scheduler.runs == 2 and scheduler.failures == 2
+    assert "provider unavailable" in caplog.text
+
+
+class FailingBeliefsChatModel(ScriptedChatModel):
+    def _respond(self, messages):
+        if "actionable insights (beliefs)" in str(messages[0].content):
+            raise RuntimeError("provider unavailable")
+        return super()._respond(messages)
+
+
+def test_failed_regeneration_keeps_last_beliefs(tmp_path) -> None:
+    memory = BaseAsyncMemory(
+        llm=FailingBeliefsChatModel(),
+        business_description="A personal AI assistant",
+        memory_file=str(tmp_path / "memory.json"),
+        include_beliefs=True,
+        belief_quiet_period=0.01,
+    )
+
+    async def run():
+        await memory._save_memory("u", {"hobby": "chess", "beliefs": "Likes chess"})
+        await memory.update_memory("u", "I live in Paris")
+        assert await memory.get_beliefs("u", fresh=True) == "Likes chess"
+        await memory.close()
+
+    asyncio.run(run())
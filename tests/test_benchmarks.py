@@ -0,0 +1,42 @@
+import asyncio
+import subprocess
+import sys
+
+from benchmarks.run import run_async_scenario, run_sync_scenario
+
+
+def test_async_benchmark_scenario() -> None:
+    result = asyncio.run(
+        run_async_scenario(users=5, messages_per_user=2, mix="facts", storage="log")
+    )
+
+    assert result["messages"] == 10
+    assert result["llm_calls_by_stage"]["extract"] == 10
+    assert result["llm_calls_per_message"] >= 1
+    assert result["latency_p99_ms"] >= result["latency_p50_ms"]
+
+
+def test_sync_benchmark_scenario() -> None:
+    result = run_sync_scenario(users=3, mix="facts", storage="sqlite")
+
+    assert result["api"] == "sync"
+    assert result["messages"] == 3
+
+
+def test_sync_benchmark_scenario_closes_its_manager() -> None:
+    # An unclosed manager is closed at interpreter exit, after the scenario's
+    # temporary directory is gone.
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "from benchmarks.run import run_sync_scenario; "
+            "run_sync_scenario(users=3, mix='facts', storage='snapshot', "
+            "memory_options={'flush_interval': 60})",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert "Traceback" not in result.stderr
@@ -0,0 +1,145 @@
+import asyncio
+import time
+
+from benchmarks.fake_llm import ScriptedChatModel
+from memory import AsyncMemoryManager, TokenBucket
+from memory.bulk import BulkIngestor
+from memory.storage import JSONFileStorage
+
+
+class FlakyChatModel(ScriptedChatModel):
+    failures: int = 0
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("429 Too Many Requests")
+        return await super()._agenerate(messages, stop, run_manager, **kwargs)
+
+
+def make_manager(tmp_path, llm) -> AsyncMemoryManager:
+    return AsyncMemoryManager(
+        llm=llm,
+        include_beliefs=False,
+        memory_options={
+            "storage": JSONFileStorage(str(tmp_path / "memory.json"), "log")
+        },
+    )
+
+
+def test_bulk_update_memory_retries_and_resumes(tmp_path) -> None:
+    checkpoint_file = str(tmp_path / "checkpoint")
+    conversations = [
+        (f"user-{i}", [{"role": "user", "content": f"I live in City{i}"}])
+        for i in range(5)
+    ]
+
+    async def run():
+        llm = FlakyChatModel(failures=2)
+        manager = make_manager(tmp_path, llm)
+        results = [
+            result
+            async for result in manager.bulk_update_memory(
+                conversations,
+                max_concurrency=2,
+                backoff=0.01,
+                checkpoint_file=checkpoint_file,
+            )
+        ]
+        assert sorted(result.user_id for result in results) == [
+            user_id for user_id, _ in conversations
+        ]
+        assert all(result.ok and not result.skipped for result in results)
+        assert sum(result.attempts for result in results) == 7
+        assert "City3" in await manager.get_memory("user-3")
+        await manager.memory.close()
+
+        async def more():
+            for item in conversations:
+                yield item
+            yield "user-5", "I live in Paris"
+
+        manager = make_manager(tmp_path, ScriptedChatModel())
+        results = {
+            result.user_id: result
+            async for result in manager.bulk_update_memory(
+                more(), checkpoint_file=checkpoint_file
+            )
+        }
+        assert [user_id for user_id, r in results.items() if not r.skipped] == [
+            "user-5"
+        ]
+        await manager.memory.close()
+
+    asyncio.run(run())
+
+
+def test_bulk_checkpoints_wait_for_group_commit(tmp_path) -> None:
+    checkpoint_file = tmp_path / "checkpoint"
+    conversations = [(f"user-{i}", f"I live in City{i}") for i in range(3)]
+    keys = {
+        BulkIngestor._checkpoint_key(user_id, message): user_id
+        for user_id, message in conversations
+    }
+
+    async def run():
+        storage = JSONFileStorage(str(tmp_path / "memory.json"), "log")
+        manager = AsyncMemoryManager(
+            llm=ScriptedChatModel(),
+            include_beliefs=False,
+            memory_options={"storage": storage, "flush_interval": 60},
+        )
+        async for result in manager.bulk_update_memory(
+            conversations, max_concurrency=1, checkpoint_file=str(checkpoint_file)
+        ):
+            assert result.ok
+            for key in checkpoint_file.read_text().split():
+                assert await storage.get(keys[key]) is not None
+        assert len(checkpoint_file.read_text().split()) == 3
+        await manager.close()
+
+    asyncio.run(run())
+
+
+def test_bulk_update_memory_reports_exhausted_retries(tmp_path) -> None:
+    async def run():
+        manager = make_manager(tmp_path, FlakyChatModel(failures=100))
+        results = [
+            result
+            async for result in manager.bulk_update_memory(
+                [("user-1", "I live in Paris")], max_retries=1, backoff=0.01
+            )
+        ]
+        assert len(results) == 1 and not results[0].ok
+        assert results[0].attempts == 2
+        await manager.memory.close()
+
+    asyncio.run(run())
+
+
+def test_bulk_rate_limit_only_throttles_its_own_run(tmp_path) -> None:
+    conversations = [(f"user-{i}", f"I live in City{i}") for i in range(6)]
+
+    async def run():
+        manager = make_manager(tmp_path, ScriptedChatModel())
+        results = manager.bulk_update_memory(conversations, requests_per_second=4)
+        await results.__anext__()
+        assert manager.memory.rate_limiter is None
+        start = time.monotonic()
+        await manager.update_memory("other", "I live in Paris")
+        assert time.monotonic() - start < 0.2
+        assert len([result async for result in results]) == 5
+        await manager.close()
+
+    asyncio.run(run())
+
+
+def test_token_bucket_limits_rate() -> None:
+    async def run():
+        bucket = TokenBucket(rate=100, capacity=1)
+        start = time.monotonic()
+        for _ in range(6):
+            await bucket.acquire()
+        assert time.monotonic() - start >= 0.045
+
+    asyncio.run(run())
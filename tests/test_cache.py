@@ -0,0 +1,26 @@
+from memory.cache import LRUCache
+
+
+def test_lru_cache_evicts_least_recently_used() -> None:
+    cache = LRUCache(max_entries=2)
+    cache.put("a", {"pet": "dog"})
+    cache.put("b", {"pet": "cat"}, dirty=True)
+    cache.get("a")
+
+    evicted = cache.put("c", {"pet": "horse"})
+
+    assert evicted == [("b", {"pet": "cat"})]
+    assert "a" in cache and "c" in cache and "b" not in cache
+    assert cache.stats()["evictions"] == 1
+
+
+def test_lru_cache_bounded_by_bytes() -> None:
+    cache = LRUCache(max_bytes=40)
+    cache.put("a", {"location": "New York City"})
+    cache.put("b", {"location": "San Francisco"})
+
+    assert len(cache) == 1
+    assert cache.get("a") is None
+    assert cache.get("b") == {"location": "San Francisco"}
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
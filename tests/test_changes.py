@@ -0,0 +1,56 @@
+import asyncio
+
+from benchmarks.fake_llm import ScriptedChatModel
+from memory.changes import ChangeFeed, MemoryChange
+from memory.memory import AsyncMemoryManager
+
+
+def test_subscriptions_and_listeners_receive_changes(tmp_path) -> None:
+    manager = AsyncMemoryManager(
+        llm=ScriptedChatModel(),
+        include_beliefs=True,
+        memory_options={"memory_file": str(tmp_path / "memory.json")},
+    )
+    heard = []
+
+    async def listener(change: MemoryChange):
+        heard.append(change)
+
+    async def run():
+        manager.add_change_listener(listener)
+        async with manager.subscribe() as everyone, manager.subscribe(["b"]) as only_b:
+            await manager.update_memory("a", "I live in Paris")
+            await manager.update_memory("b", "I love chess")
+            await manager.update_memory("a", "I live in Paris")
+            await manager.delete_memory("a")
+
+            first = await everyone.__anext__()
+            assert first.user_id == "a" and first.kind == "update"
+            assert "location" in first.changed_keys
+            assert "last_updated" not in first.changed_keys
+            assert (await everyone.__anext__()).user_id == "b"
+            deleted = await everyone.__anext__()
+            assert deleted.kind == "delete" and "location" in deleted.changed_keys
+            assert (await only_b.__anext__()).user_id == "b"
+            assert only_b._queue.empty()
+        await manager.memory._drain_background_tasks()
+        manager.remove_change_listener(listener)
+        await manager.memory.close()
+
+    asyncio.run(run())
+    assert [c.user_id for c in heard] == ["a", "b", "a"]
+    assert heard[0].beliefs
+
+
+def test_slow_subscriber_drops_oldest_changes() -> None:
+    async def run():
+        feed = ChangeFeed()
+        subscription = feed.subscribe(max_queue=2)
+        for user_id in ["a", "b", "c"]:
+            feed.publish(MemoryChange(user_id, "update", ["k"]))
+        assert subscription.dropped == 1
+        subscription.close()
+        assert not feed.active
+        return [change.user_id async for change in subscription]
+
+    assert asyncio.run(run()) == ["c"]
@@ -0,0 +1,95 @@
+import asyncio
+
+from benchmarks.fake_llm import ScriptedChatModel
+from memory.compaction import MemoryCompactor
+from memory.memory import META_KEY, BaseAsyncMemory
+
+
+def test_compact_list_dedupes_and_evicts_stale_items() -> None:
+    compactor = MemoryCompactor(max_age=100, max_list_items=3)
+    values = ["Chess", "golf", "chess ", "tennis", "go", "poker"]
+    added_at = [0, 0, 950, 960, 970, 980]
+
+    kept, times = compactor.compact_list(values, added_at, now=1000)
+
+    assert kept == ["tennis", "go", "poker"] and times == [960, 970, 980]
+    assert compactor.stats["items_deduplicated"] == 1
+    assert compactor.stats["items_evicted"] == 2
+    assert compactor.compact_list(["a"], [0], now=1000)[0] == ["a"]
+
+
+def test_oversized_records_are_compacted_in_background(tmp_path) -> None:
+    llm = ScriptedChatModel()
+    compactor = MemoryCompactor(
+        threshold_bytes=200, max_age=3600, summarize=True, max_value_bytes=300
+    )
+    memory = BaseAsyncMemory(
+        llm=llm,
+        business_description="A personal AI assistant",
+        memory_file=str(tmp_path / "memory.json"),
+        compactor=compactor,
+    )
+
+    async def run():
+        await memory.update_memory("u", "I love chess")
+        user_memory = await memory._get_user_memory("u")
+        hobbies = ["chess", "Chess"] + [f"hobby number {i}" for i in range(30)]
+        await memory._save_memory(
+            "u",
+            {
+                **user_memory,
+                "hobby": hobbies,
+                "bio": "x" * 400,
+                META_KEY: {"updated_at": {}, "added_at": {"hobby": [0] * 32}},
+            },
+        )
+        await memory.update_memory("u", "I live in Paris")
+        await memory.wait_for_background_tasks()
+
+        user_memory = await memory._get_user_memory("u")
+        assert user_memory["hobby"] == ["hobby number 29"]
+        assert user_memory["location"] == "Paris"
+        assert user_memory["bio"] == "x" * 100
+        assert compactor.stats["keys_summarized"] == 1
+        assert compactor.stats["runs"] == 1
+        assert compactor.stats["bytes_reclaimed"] > 0
+        assert compactor.stats["items_deduplicated"] == 1
+        assert "hobby" in user_memory[META_KEY]["added_at"]
+        await memory.close()
+
+    asyncio.run(run())
+
+
+def test_compaction_that_reclaims_nothing_is_not_saved_or_retried(tmp_path) -> None:
+    compactor = MemoryCompactor(threshold_bytes=100)
+    memory = BaseAsyncMemory(
+        llm=ScriptedChatModel(),
+        business_description="A personal AI assistant",
+        memory_file=str(tmp_path / "memory.json"),
+        compactor=compactor,
+    )
+
+    async def run():
+        await memory.update_memory("u", "I live in Paris")
+        user_memory = await memory._get_user_memory("u")
+        await memory._save_memory("u", {**user_memory, "bio": "x" * 2000})
+        saves = memory.storage.bytes_written
+
+        assert await memory.compact_memory("u") == 0
+        assert memory.storage.bytes_written == saves
+        assert compactor.stats["runs"] == 0
+
+        compactions = []
+        compact_memory = memory._compact_memory
+
+        async def counting_compact_memory(user_id):
+            compactions.append(user_id)
+            return await compact_memory(user_id)
+
+        memory._compact_memory = counting_compact_memory
+        await memory.update_memory("u", "I love chess")
+        await memory.wait_for_background_tasks()
+        assert compactions == []
+        await memory.close()
+
+    asyncio.run(run())
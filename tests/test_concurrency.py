@@ -0,0 +1,201 @@
+import asyncio
+import json
+from typing import List
+
+import pytest
+
+from benchmarks.fake_llm import FACT_TEMPLATES, ScriptedChatModel
+from memory.memory import BaseAsyncMemory
+from memory.storage import SQLiteStorage
+
+FACTS = {
+    "pet": "parrot",
+    "location": "Paris",
+    "job": "teacher",
+    "hobby": "chess",
+    "food_preference": "sushi",
+}
+MESSAGES = [FACT_TEMPLATES[key].format(value=value) for key, value in FACTS.items()]
+
+
+class TrackingChatModel(ScriptedChatModel):
+    """Records how many calls are in flight and delays calls in a set order."""
+
+    delays: List[float] = []
+    in_flight: int = 0
+    max_in_flight: int = 0
+
+    def _delay(self) -> float:
+        return self.delays.pop(0) if self.delays else self.latency
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return await super()._agenerate(messages, stop, run_manager, **kwargs)
+        finally:
+            self.in_flight -= 1
+
+
+def make_memory(tmp_path, llm, **kwargs) -> BaseAsyncMemory:
+    return BaseAsyncMemory(
+        llm=llm,
+        business_description="A personal AI assistant",
+        memory_file=str(tmp_path / "memory.json"),
+        **kwargs,
+    )
+
+
+def test_concurrent_updates_for_one_user_keep_every_key(tmp_path) -> None:
+    memory = make_memory(tmp_path, ScriptedChatModel(latency=0.01, jitter=0.01))
+
+    async def run():
+        await asyncio.gather(
+            *(memory.update_memory("u", message) for message in MESSAGES)
+        )
+        user_memory = await memory._get_user_memory("u")
+        assert {key: user_memory.get(key) for key in FACTS} == FACTS
+        await memory.close()
+
+    asyncio.run(run())
+
+
+def test_coalesced_updates_extract_queued_messages_once(tmp_path) -> None:
+    llm = ScriptedChatModel(latency=0.01)
+    memory = make_memory(tmp_path, llm, coalesce_updates=True)
+
+    async def run():
+        results = await asyncio.gather(
+            *(memory.update_memory("u", message) for message in MESSAGES)
+        )
+        user_memory = await memory._get_user_memory("u")
+        assert {key: user_memory.get(key) for key in FACTS} == FACTS
+        # The first message is processed alone; the rest queue up behind it.
+        assert llm.calls == {"extract": 1, "extract_batch": 1}
+        assert all(result is results[-1] for result in results[1:])
+        await memory.close()
+
+    asyncio.run(run())
+
+
+def test_llm_calls_per_update_respect_the_concurrency_cap(tmp_path) -> None:
+    llm = TrackingChatModel(latency=0.01)
+    memory = make_memory(tmp_path, llm, max_concurrent_llm_calls=2)
+    updated = {key: f"new {value}" for key, value in FACTS.items()}
+
+    async def run():
+        await memory._save_memory("u", dict(FACTS))
+        await memory.update_memory(
+            "u",
+            "\n".join(
+                FACT_TEMPLATES[key].format(value=value)
+                for key, value in updated.items()
+            ),
+        )
+        assert llm.calls["resolve_conflict"] == len(FACTS)
+        assert llm.max_in_flight == 2
+        user_memory = await memory._get_user_memory("u")
+        assert {key: user_memory[key] for key in FACTS} == updated
+        await memory.close()
+
+    asyncio.run(run())
+
+
+class PetKeyChatModel(TrackingChatModel):
+    """Extracts several pet facts under keys that only the LLM maps to ``pet``."""
+
+    def _respond(self, messages):
+        result = super()._respond(messages)
+        prompt = str(messages[0].content)
+        message = result.generations[0].message
+        if "finds relevant keys" in prompt:
+            message.content = "pet"
+        elif "personal information from messages" in prompt:
+            message.content = json.dumps(
+                {"pet_name": "Rex", "pet_type": "parrot", "pet_breed": "beagle"}
+            )
+        return result
+
+
+def test_values_mapped_to_one_key_merge_in_extraction_order(tmp_path) -> None:
+    # Later key lookups finish first, so merging in completion order would
+    # reverse the values.
+    llm = PetKeyChatModel(delays=[0.0, 0.03, 0.02, 0.01])
+    memory = make_memory(tmp_path, llm)
+
+    async def run():
+        await memory._save_memory("u", {"pet": ["dog named Charlie"]})
+        user_memory = await memory.update_memory("u", "Tell you about my pets")
+        assert llm.calls["find_key"] == 3
+        assert user_memory["pet"] == ["dog named Charlie", "Rex", "parrot", "beagle"]
+        await memory.close()
+
+    asyncio.run(run())
+
+
+def test_processes_sharing_sqlite_do_not_overwrite_each_other(tmp_path) -> None:
+    db_file = str(tmp_path / "memory.db")
+    # Two memories on separate connections stand in for two worker processes.
+    workers = [
+        BaseAsyncMemory(
+            llm=ScriptedChatModel(latency=0.02),
+            business_description="A personal AI assistant",
+            storage=SQLiteStorage(db_file),
+            cache_max_entries=0,
+        )
+        for _ in range(2)
+    ]
+
+    async def run():
+        # Both updates resolve a conflict with the LLM between reading the
+        # record and writing it back.
+        await SQLiteStorage(db_file).put("u", {"location": "Berlin", "job": "teacher"})
+        await asyncio.gather(
+            workers[0].update_memory("u", "I live in Paris"),
+            workers[1].update_memory("u", "I work as a nurse"),
+        )
+        user_memory = await SQLiteStorage(db_file).get("u")
+        assert user_memory["location"] == "Paris" and user_memory["job"] == "nurse"
+        for worker in workers:
+            await worker.close()
+
+    asyncio.run(run())
+
+
+def test_group_commit_is_rejected_for_shared_storage(tmp_path) -> None:
+    with pytest.raises(ValueError):
+        BaseAsyncMemory(
+            llm=ScriptedChatModel(),
+            business_description="A personal AI assistant",
+            storage=SQLiteStorage(str(tmp_path / "memory.db")),
+            flush_interval=1.0,
+        )
+
+
+def test_cached_records_are_revalidated_against_shared_storage(tmp_path) -> None:
+    db_file = str(tmp_path / "memory.db")
+    first, second = (
+        BaseAsyncMemory(
+            llm=ScriptedChatModel(),
+            business_description="A personal AI assistant",
+            storage=SQLiteStorage(db_file),
+        )
+        for _ in range(2)
+    )
+
+    async def run():
+        await first.update_memory("u", "I live in Paris")
+        await second.update_memory("u", "I work as a nurse")
+        assert json.loads(await first.get_memory("u"))["job"] == "nurse"
+        await first.update_memory("u", "I love chess")
+        user_memory = await SQLiteStorage(db_file).get("u")
+        assert {key: user_memory[key] for key in ("location", "job", "hobby")} == {
+            "location": "Paris",
+            "job": "nurse",
+            "hobby": "chess",
+        }
+        assert first.cache.stats()["hits"] > 0
+        await first.close()
+        await second.close()
+
+    asyncio.run(run())
@@ -0,0 +1,71 @@
+import asyncio
+
+from benchmarks.fake_llm import ScriptedChatModel
+from memory.context import fit_entry, rank_keys, render_budgeted_context
+from memory.memory import META_KEY, BaseAsyncMemory
+from memory.retrieval import estimate_tokens
+
+
+def test_rank_keys_by_priority_then_recency() -> None:
+    user_memory = {"pet": "dog", "job": "nurse", "location": "Paris"}
+    updated_at = {"pet": "2024-01-01", "job": "2024-03-01", "location": "2024-02-01"}
+
+    assert rank_keys(user_memory, updated_at) == ["job", "location", "pet"]
+    assert rank_keys(user_memory, updated_at, {"pet": 1}) == ["pet", "job", "location"]
+
+
+def test_fit_entry_keeps_latest_list_items_and_cuts_text() -> None:
+    pets = [f"pet number {i}" for i in range(20)]
+
+    entry = fit_entry("pets", pets, 20)
+    assert entry.startswith("pets: ['pet number") and "earlier)" in entry
+    assert "'pet number 19'" in entry and estimate_tokens(entry) <= 20
+    assert fit_entry("bio", "x" * 400, 20).endswith("...")
+    assert fit_entry("bio", "x" * 400, 3) is None
+
+
+def test_fit_entry_cuts_the_newest_list_item_when_it_alone_is_too_long() -> None:
+    entry = fit_entry("notes", ["x" * 400], 40)
+    assert entry.startswith("notes: ['xxx") and entry.endswith("...']")
+    assert estimate_tokens(entry) <= 40
+
+    entry = fit_entry("notes", ["short", "y" * 400], 40)
+    assert "yyy" in entry and entry.endswith("(+1 earlier)")
+    assert estimate_tokens(entry) <= 40
+    assert fit_entry("notes", ["x" * 400], 3) is None
+
+
+def test_render_budgeted_context_stays_under_budget() -> None:
+    user_memory = {
+        "hobbies": [f"hobby {i}" for i in range(100)],
+        "location": "Paris",
+        "job": "nurse",
+    }
+    updated_at = {"hobbies": "2024-01-01", "location": "2024-02-01"}
+
+    context = render_budgeted_context(user_memory, updated_at, 40)
+    assert estimate_tokens(context) <= 40
+    assert context.splitlines()[1] == "location: Paris"
+    assert "hobby 99" in context
+
+
+def test_get_memory_context_max_tokens_hides_bookkeeping(tmp_path) -> None:
+    memory = BaseAsyncMemory(
+        llm=ScriptedChatModel(),
+        business_description="A personal AI assistant",
+        memory_file=str(tmp_path / "memory.json"),
+    )
+
+    async def run():
+        await memory.update_memory("u", "I live in Paris")
+        await memory.update_memory("u", "I love chess")
+        user_memory = await memory._get_user_memory("u")
+        assert set(user_memory[META_KEY]["updated_at"]) == {"location", "hobby"}
+        assert META_KEY not in await memory.get_memory("u")
+
+        context = await memory.get_memory_context("u", max_tokens=10)
+        assert context == "User Memory:\nhobby: chess\n"
+        assert META_KEY not in await memory.get_memory_context("u")
+        await memory.close()
+
+    asyncio.run(run())
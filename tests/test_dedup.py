@@ -0,0 +1,68 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from benchmarks.fake_llm import ScriptedChatModel
+from memory.memory import BaseAsyncMemory
+
+
+def make_memory(tmp_path, llm, **kwargs) -> BaseAsyncMemory:
+    return BaseAsyncMemory(
+        llm=llm,
+        business_description="A personal AI assistant",
+        memory_file=str(tmp_path / "memory.json"),
+        **kwargs,
+    )
+
+
+def test_redelivered_message_ids_are_skipped(tmp_path) -> None:
+    llm = ScriptedChatModel()
+    memory = make_memory(tmp_path, llm, dedup_max_seen=2)
+
+    async def run():
+        first = await memory.update_memory("u", "I love chess", message_id="m1")
+        calls = llm.total_calls
+        assert await memory.update_memory("u", "I love chess", message_id="m1") is first
+        assert llm.total_calls == calls
+
+        # Without an id and with content hashing off, nothing is deduplicated.
+        await memory.update_memory("u", "I love chess")
+        assert llm.total_calls > calls
+
+        await memory.update_memory("u", "I love guitar", message_id="m2")
+        await memory.update_memory("u", "I love painting", message_id="m3")
+        user_memory = await memory.storage.get("u")
+        assert user_memory["_meta"]["seen"] == ["m2", "m3"]
+        assert memory.dedup_stats["duplicates"] == 1
+        await memory.close()
+
+    asyncio.run(run())
+
+
+def test_batch_updates_skip_processed_messages_incrementally(tmp_path) -> None:
+    llm = ScriptedChatModel()
+    memory = make_memory(tmp_path, llm, deduplicate_messages=True)
+    conversation = [
+        HumanMessage("I live in Paris"),
+        AIMessage("Paris is lovely!"),
+    ]
+
+    async def run():
+        await memory.batch_update_memory("u", conversation)
+        calls = llm.total_calls
+        await memory.batch_update_memory("u", conversation)
+        assert llm.total_calls == calls
+
+        user_memory = await memory.batch_update_memory(
+            "u", conversation + [HumanMessage("I work as a nurse")]
+        )
+        assert llm.calls["extract_batch"] == 2
+        assert user_memory["location"] == "Paris" and user_memory["job"] == "nurse"
+        assert len(user_memory["_meta"]["seen"]) == 3
+
+        # Content hashes also catch redelivered single messages.
+        assert await memory.update_memory("u", "I work as a nurse") is user_memory
+        assert memory.dedup_stats["duplicates"] == 5
+        await memory.close()
+
+    asyncio.run(run())
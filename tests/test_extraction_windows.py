@@ -0,0 +1,37 @@
+import asyncio
+
+from benchmarks.fake_llm import ScriptedChatModel
+from memory.memory import BaseAsyncMemory
+
+
+def test_conversation_windows_overlap_and_cover_all_lines() -> None:
+    lines = [f"user: message number {i:02d}" for i in range(10)]  # 7 tokens each
+    windows = BaseAsyncMemory._conversation_windows(lines, 21, 7)
+
+    assert windows[0].splitlines() == lines[0:3]
+    assert windows[1].splitlines() == lines[2:5]
+    assert windows[-1].splitlines()[-1] == lines[-1]
+    assert BaseAsyncMemory._conversation_windows(lines, 1000, 7) == ["\n".join(lines)]
+    assert BaseAsyncMemory._conversation_windows(["x" * 400], 10, 5) == ["x" * 400]
+
+
+def test_extract_batch_information_later_windows_win(tmp_path) -> None:
+    llm = ScriptedChatModel()
+    memory = BaseAsyncMemory(
+        llm=llm,
+        business_description="A personal AI assistant",
+        memory_file=str(tmp_path / "memory.json"),
+        extraction_window_tokens=20,
+        extraction_window_overlap=0,
+    )
+    messages = [
+        {"role": "user", "content": "I live in Paris"},
+        {"role": "user", "content": "I love chess"},
+        {"role": "assistant", "content": "Nice!"},
+        {"role": "user", "content": "I live in Tokyo"},
+    ]
+
+    extracted_info = asyncio.run(memory._extract_batch_information(messages))
+
+    assert extracted_info == {"location": "Tokyo", "hobby": "chess"}
+    assert llm.calls["extract_batch"] > 1
@@ -0,0 +1,166 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import weakref
+
+import pytest
+
+from benchmarks.fake_llm import ScriptedChatModel
+from memory.flusher import GroupCommitFlusher
+from memory.memory import BaseAsyncMemory, MemoryManager, _close_at_exit
+
+
+def test_flusher_groups_dirty_records_and_retries_failures() -> None:
+    writes = []
+    fail = [True]
+
+    async def write(batch):
+        if fail[0]:
+            fail[0] = False
+            raise OSError("disk full")
+        writes.append(dict(batch))
+
+    async def run():
+        flusher = GroupCommitFlusher(write, flush_interval=0.05, max_dirty=3)
+        flusher.mark("a", {"v": 1})
+        flusher.mark("a", {"v": 2})
+        flusher.mark("b", {"v": 1})
+        assert flusher.get("a") == {"v": 2}
+        with pytest.raises(OSError):
+            await flusher.flush()
+        assert "a" in flusher and "b" in flusher
+
+        await asyncio.sleep(0.1)
+        assert writes == [{"a": {"v": 2}, "b": {"v": 1}}]
+
+        for user_id in ["c", "d", "e"]:
+            flusher.mark(user_id, {"v": 1})
+        await flusher.wait_idle()
+        assert len(writes) == 2 and sorted(writes[1]) == ["c", "d", "e"]
+        assert flusher.stats["saves_coalesced"] == 1
+
+    asyncio.run(run())
+
+
+def test_memory_saves_are_flushed_in_groups(tmp_path) -> None:
+    memory_file = str(tmp_path / "memory.json")
+    memory = BaseAsyncMemory(
+        llm=ScriptedChatModel(),
+        business_description="A personal AI assistant",
+        memory_file=memory_file,
+        cache_max_entries=0,
+        flush_interval=60,
+    )
+
+    async def run():
+        for user_id, message in [
+            ("a", "I live in Paris"),
+            ("b", "I love chess"),
+            ("a", "I work as a nurse"),
+        ]:
+            await memory.update_memory(user_id, message)
+        assert not os.path.exists(memory_file)
+        assert json.loads(await memory.get_memory("a"))["job"] == "nurse"
+
+        await memory.flush()
+        with open(memory_file) as f:
+            stored = json.load(f)
+        assert stored["a"]["location"] == "Paris" and stored["b"]["hobby"] == "chess"
+        assert memory.flusher.stats["flushes"] == 1
+
+        await memory.update_memory("c", "I have a pet parrot")
+        assert await memory.delete_memory("c")
+        await memory.close()
+        with open(memory_file) as f:
+            assert sorted(json.load(f)) == ["a", "b"]
+
+    asyncio.run(run())
+
+
+class FailingBeliefsChatModel(ScriptedChatModel):
+    def _respond(self, messages):
+        if "actionable insights (beliefs)" in str(messages[0].content):
+            raise RuntimeError("provider unavailable")
+        return super()._respond(messages)
+
+
+def test_close_flushes_saves_when_background_work_fails(tmp_path, caplog) -> None:
+    memory_file = str(tmp_path / "memory.json")
+    memory = BaseAsyncMemory(
+        llm=FailingBeliefsChatModel(),
+        business_description="A personal AI assistant",
+        memory_file=memory_file,
+        include_beliefs=True,
+        belief_quiet_period=30,
+        flush_interval=10,
+    )
+
+    async def run():
+        await memory.update_memory("a", "I live in Paris")
+        await memory._save_memory("b", {"location": "Tokyo"})
+
+        async def fail():
+            raise RuntimeError("compaction failed")
+
+        memory._spawn(fail())
+        await memory.close()
+
+    asyncio.run(run())
+    with open(memory_file) as f:
+        stored = json.load(f)
+    assert stored["a"]["location"] == "Paris" and stored["b"]["location"] == "Tokyo"
+    assert "compaction failed" in caplog.text
+
+
+def test_sync_manager_flush_and_close(tmp_path) -> None:
+    memory_file = str(tmp_path / "memory.json")
+    manager = MemoryManager(
+        llm=ScriptedChatModel(),
+        include_beliefs=False,
+        memory_options={"memory_file": memory_file, "flush_interval": 60},
+    )
+    manager.update_memory("a", "I live in Paris")
+    assert not os.path.exists(memory_file)
+    manager.flush()
+    manager.update_memory("a", "I work as a nurse")
+    manager.close()
+    with open(memory_file) as f:
+        assert json.load(f)["a"]["job"] == "nurse"
+
+
+def test_sync_manager_closes_itself_at_exit(tmp_path) -> None:
+    memory_file = str(tmp_path / "memory.json")
+    script = (
+        "from benchmarks.fake_llm import ScriptedChatModel\n"
+        "from memory import MemoryManager\n"
+        "manager = MemoryManager(llm=ScriptedChatModel(), include_beliefs=False, "
+        f"memory_options={{'memory_file': {memory_file!r}, 'flush_interval': 60}})\n"
+        "manager.update_memory('a', 'I live in Paris')\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    )
+
+    assert "Traceback" not in result.stderr
+    with open(memory_file) as f:
+        assert json.load(f)["a"]["location"] == "Paris"
+
+
+def test_close_at_exit_logs_failures(tmp_path, caplog) -> None:
+    manager = MemoryManager(
+        llm=ScriptedChatModel(),
+        include_beliefs=False,
+        memory_options={"memory_file": str(tmp_path / "memory.json")},
+    )
+
+    async def fail():
+        raise OSError("disk full")
+
+    manager.memory.storage.close = fail
+    _close_at_exit(weakref.ref(manager.memory))
+    del manager.memory.storage.close
+
+    assert "Failed to close memory at exit" in caplog.text
+    assert "disk full" in caplog.text
@@ -0,0 +1,88 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from benchmarks.fake_llm import ScriptedChatModel
+from memory.history import JSONLinesHistory, SQLiteHistory
+from memory.memory import BaseAsyncMemory
+
+
+@pytest.mark.parametrize("backend", ["jsonl", "sqlite"])
+def test_history_point_in_time_reads_diff_and_rollback(tmp_path, backend) -> None:
+    history = (
+        JSONLinesHistory(str(tmp_path / "history.jsonl"), snapshot_interval=3)
+        if backend == "jsonl"
+        else SQLiteHistory(str(tmp_path / "history.db"), snapshot_interval=3)
+    )
+    memory = BaseAsyncMemory(
+        llm=ScriptedChatModel(),
+        business_description="A personal AI assistant",
+        memory_file=str(tmp_path / "memory.json"),
+        history=history,
+    )
+
+    async def run():
+        for message in ["I live in Paris", "I love chess", "I live in Tokyo"]:
+            await memory.update_memory("u", message)
+        checkpoint = time.time()
+        await memory.update_memory("u", "I work as a nurse")
+
+        versions = await memory.get_history("u")
+        assert [v["version"] for v in versions] == [1, 2, 3, 4]
+        assert [v["kind"] for v in versions] == [
+            "snapshot",
+            "delta",
+            "delta",
+            "snapshot",
+        ]
+        assert "location" in versions[2]["changed_keys"]
+
+        assert (
+            json.loads(await memory.get_memory("u", version=1))["location"] == "Paris"
+        )
+        as_of_checkpoint = json.loads(await memory.get_memory("u", as_of=checkpoint))
+        assert as_of_checkpoint["location"] == "Tokyo" and "job" not in as_of_checkpoint
+        # Whole epoch seconds are a point in time, not a version number.
+        as_of_seconds = await memory.get_memory("u", as_of=int(checkpoint))
+        assert "nurse" not in (as_of_seconds or "")
+        with pytest.raises(ValueError):
+            await memory.get_memory("u", as_of=checkpoint, version=1)
+        assert "_meta" not in await memory.get_memory("u", version=4)
+
+        diff = await memory.diff_memory("u", 2, 4)
+        assert diff["changed"]["location"] == {"old": "Paris", "new": "Tokyo"}
+        assert diff["added"] == {"job": "nurse"} and diff["removed"] == {}
+
+        restored = await memory.rollback_memory("u", 1)
+        assert restored["location"] == "Paris" and "hobby" not in restored
+        assert len(await memory.get_history("u")) == 5
+
+        await memory.delete_memory("u")
+        assert await memory.get_memory("u") is None
+        assert (
+            json.loads(await memory.get_memory("u", version=5))["location"] == "Paris"
+        )
+        await memory.close()
+
+    asyncio.run(run())
+
+
+def test_jsonl_history_reloads_index_and_drops_torn_tail(tmp_path) -> None:
+    path = str(tmp_path / "history.jsonl")
+
+    async def run():
+        history = JSONLinesHistory(path)
+        await history.record("a", None, {"x": 1})
+        await history.record("b", None, {"y": 1})
+        await history.record("a", {"x": 1}, {"x": 2})
+        with open(path, "a") as f:
+            f.write('{"user_id": "a", "vers')
+
+        reloaded = JSONLinesHistory(path)
+        assert await reloaded.state_at("a") == {"x": 2}
+        await reloaded.record("a", {"x": 2}, {"x": 3})
+        assert await JSONLinesHistory(path).state_at("a") == {"x": 3}
+
+    asyncio.run(run())
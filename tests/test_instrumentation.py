@@ -0,0 +1,56 @@
+import asyncio
+
+from benchmarks.fake_llm import ScriptedChatModel
+from memory.instrumentation import Histogram, HistogramAggregator, stage_timer
+from memory.llms.cache import LLMResponseCache
+from memory.memory import BaseAsyncMemory
+
+
+def test_histogram_percentiles_use_bucket_bounds() -> None:
+    histogram = Histogram(buckets=(0.01, 0.1, 1.0))
+    for value in [0.005] * 98 + [0.5, 3.0]:
+        histogram.record(value)
+
+    assert histogram.percentile(50) == 0.01
+    assert histogram.percentile(99) == 1.0
+    assert histogram.percentile(100) == 3.0
+    assert histogram.snapshot()["count"] == 100
+
+
+def test_stage_timer_is_shared_noop_without_callbacks() -> None:
+    assert stage_timer([], "save") is stage_timer([], "extract")
+
+
+def test_aggregator_records_stages_llm_calls_and_bytes(tmp_path) -> None:
+    aggregator = HistogramAggregator()
+    memory = BaseAsyncMemory(
+        llm=ScriptedChatModel(),
+        business_description="A personal AI assistant",
+        memory_file=str(tmp_path / "memory.json"),
+        include_beliefs=True,
+        llm_cache=LLMResponseCache(),
+        callbacks=[aggregator],
+    )
+
+    async def run():
+        await memory.update_memory("u1", "I live in Paris")
+        await memory.update_memory("u2", "I live in Paris")
+        await memory.get_memory_context("u1", "Where do I live?")
+        await memory.close()
+
+    asyncio.run(run())
+    snapshot = aggregator.snapshot()
+
+    assert {
+        "update_memory",
+        "extract",
+        "beliefs",
+        "save",
+        "get_memory_context",
+        "retrieve",
+    } <= set(snapshot["stages"])
+    assert snapshot["stages"]["update_memory"]["count"] == 2
+    # The second extraction is a cache hit; beliefs differ by timestamp.
+    assert snapshot["llm_calls"] == 3 and snapshot["llm_cache_hits"] == 1
+    assert snapshot["prompt_tokens"] > 0 and snapshot["completion_tokens"] > 0
+    assert snapshot["saves"] == 2 and snapshot["bytes_persisted"] > 0
@@ -0,0 +1,75 @@
+import asyncio
+from typing import List
+
+from benchmarks.fake_llm import ScriptedChatModel
+from memory.memory import BaseAsyncMemory, KeyMatcher
+
+key_matcher = KeyMatcher()
+
+
+def test_plural_keys_match_exactly() -> None:
+    assert key_matcher.match("pets", ["location", "pet"]) == ("pet", 1.0)
+
+
+def test_synonym_keys_match() -> None:
+    key, confidence = key_matcher.match("city", ["pet", "location"])
+
+    assert key == "location"
+    assert confidence >= 0.85
+
+
+def test_unrelated_keys_have_low_confidence() -> None:
+    _, confidence = key_matcher.match("age", ["pet", "location"])
+
+    assert confidence < 0.5
+
+
+def test_synonym_members_match_their_head_key() -> None:
+    assert key_matcher.match("spouse", ["pet", "family"]) == ("family", 0.95)
+    assert key_matcher.match("dog", ["location", "pet"]) == ("pet", 0.95)
+
+
+def test_synonym_members_are_ambiguous_with_each_other() -> None:
+    for new_key, existing_key in [
+        ("spouse", "children"),
+        ("cat", "dog"),
+        ("work", "role"),
+        ("role", "occupation"),
+    ]:
+        _, confidence = key_matcher.match(new_key, [existing_key])
+        assert 0.5 <= confidence < 0.85, (new_key, existing_key)
+
+
+class ReservedKeyChatModel(ScriptedChatModel):
+    """Answers every key lookup with a reserved key."""
+
+    prompts: List[str] = []
+
+    def _respond(self, messages):
+        result = super()._respond(messages)
+        prompt = "\n".join(str(message.content) for message in messages)
+        if "finds relevant keys" in prompt:
+            self.prompts.append(prompt)
+            result.generations[0].message.content = "beliefs"
+        return result
+
+
+def test_llm_key_lookup_never_picks_reserved_keys(tmp_path) -> None:
+    llm = ReservedKeyChatModel()
+    memory = BaseAsyncMemory(
+        llm=llm,
+        business_description="A personal AI assistant",
+        memory_file=str(tmp_path / "memory.json"),
+    )
+    user_memory = {
+        "role": "nurse",
+        "beliefs": "Suggest night-shift friendly plans",
+        "last_updated": "2024-01-01T00:00:00",
+    }
+
+    key = asyncio.run(memory._find_relevant_key("u", "work", user_memory))
+
+    assert key is None
+    assert memory.key_match_stats["llm"] == 1
+    existing_keys = llm.prompts[0].split("Existing keys:")[1].splitlines()[0]
+    assert existing_keys.strip() == "role"
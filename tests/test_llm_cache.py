@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+from langchain_core.exceptions import OutputParserException
+from langchain_core.messages import HumanMessage
+
+from benchmarks.fake_llm import ScriptedChatModel
+from memory.llms.cache import LLMResponseCache
+from memory.memory import BaseAsyncMemory
+
+
+def test_llm_cache_memory_and_disk_tiers(tmp_path) -> None:
+    db_file = str(tmp_path / "llm_cache.db")
+    key = LLMResponseCache.make_key([HumanMessage("New key: pets")], "openai-gpt-4o")
+
+    async def run():
+        cache = LLMResponseCache(db_file=db_file)
+        assert await cache.get(key) is None
+        await cache.set(key, "pet")
+        assert await cache.get(key) == "pet"
+        cache.close()
+
+        restarted = LLMResponseCache(db_file=db_file)
+        assert await restarted.get(key) == "pet"
+        return cache.stats(), restarted.stats()
+
+    stats, restarted_stats = asyncio.run(run())
+    assert stats["memory_hits"] == 1 and stats["misses"] == 1
+    assert restarted_stats["disk_hits"] == 1
+
+
+def test_llm_cache_entries_expire() -> None:
+    async def run():
+        cache = LLMResponseCache(ttl=-1)
+        await cache.set("key", "value")
+        return await cache.get("key")
+
+    assert asyncio.run(run()) is None
+
+
+class FlakyJSONModel(ScriptedChatModel):
+    """Returns malformed JSON for the first extraction, valid JSON afterwards."""
+
+    def _respond(self, messages):
+        result = super()._respond(messages)
+        if self.calls.get("extract") == 1:
+            result.generations[0].message.content = "Sorry, I can't help with that."
+        return result
+
+
+def test_malformed_completions_are_not_cached(tmp_path) -> None:
+    llm = FlakyJSONModel(calls={})
+    memory = BaseAsyncMemory(
+        llm=llm,
+        business_description="A personal AI assistant",
+        memory_file=str(tmp_path / "memory.json"),
+        llm_cache=LLMResponseCache(),
+    )
+
+    async def run():
+        with pytest.raises(OutputParserException):
+            await memory.update_memory("u", "I live in Paris")
+        user_memory = await memory.update_memory("u", "I live in Paris")
+        assert user_memory["location"] == "Paris"
+        assert llm.calls["extract"] == 2
+
+    asyncio.run(run())
+
+
+def test_llm_cache_only_accepts_temperature_zero() -> None:
+    cache = LLMResponseCache()
+    assert cache.accepts(ScriptedChatModel(temperature=0))
+    assert not cache.accepts(ScriptedChatModel(temperature=None))
+    assert not cache.accepts(ScriptedChatModel(temperature=0.7))
+    assert LLMResponseCache(deterministic_only=False).accepts(
+        ScriptedChatModel(temperature=None)
+    )
@@ -0,0 +1,76 @@
+import asyncio
+import os
+import signal
+
+import pytest
+
+from memory.loop import BackgroundLoop
+
+
+def test_background_loop_is_reused_across_calls() -> None:
+    background_loop = BackgroundLoop()
+
+    async def current_loop():
+        return asyncio.get_running_loop()
+
+    try:
+        assert background_loop.run(current_loop()) is background_loop.run(
+            current_loop()
+        )
+    finally:
+        background_loop.stop()
+
+
+def test_background_loop_runs_inside_another_event_loop() -> None:
+    background_loop = BackgroundLoop()
+
+    async def answer():
+        return 42
+
+    async def caller():
+        return background_loop.run(answer())
+
+    try:
+        assert asyncio.run(caller()) == 42
+    finally:
+        background_loop.stop()
+
+
+def test_background_loop_rejects_calls_from_its_own_thread() -> None:
+    background_loop = BackgroundLoop()
+
+    async def reentrant():
+        async def noop():
+            pass
+
+        background_loop.run(noop())
+
+    try:
+        with pytest.raises(RuntimeError):
+            background_loop.run(reentrant())
+    finally:
+        background_loop.stop()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+def test_background_loop_is_rebuilt_after_fork() -> None:
+    background_loop = BackgroundLoop()
+
+    async def answer():
+        return 42
+
+    try:
+        assert background_loop.run(answer()) == 42
+        pid = os.fork()
+        if pid == 0:
+            # Kill the child instead of hanging the test if the loop is dead.
+            signal.alarm(5)
+            try:
+                os._exit(0 if background_loop.run(answer()) == 42 else 1)
+            except BaseException:
+                os._exit(1)
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+        assert background_loop.run(answer()) == 42
+    finally:
+        background_loop.stop()
@@ -0,0 +1,71 @@
+import asyncio
+
+from benchmarks.fake_llm import ScriptedChatModel
+from memory.memory import BaseAsyncMemory
+
+
+def test_apply_memory_patch() -> None:
+    user_memory = {"pet": "dog named Charlie", "location": "New York", "beliefs": "-"}
+
+    BaseAsyncMemory._apply_memory_patch(
+        user_memory,
+        [
+            {"op": "append", "key": "pet", "value": "horse named Luna"},
+            {"op": "replace", "key": "location", "value": "Paris"},
+            {"op": "add", "key": "job", "value": "software engineer"},
+            {"op": "append", "key": "pet", "value": "horse named Luna"},
+            {"op": "replace", "key": "beliefs", "value": "ignored"},
+        ],
+    )
+
+    assert user_memory == {
+        "pet": ["dog named Charlie", "horse named Luna"],
+        "location": "Paris",
+        "job": "software engineer",
+        "beliefs": "-",
+    }
+
+
+def make_consolidated_memory(tmp_path, llm) -> BaseAsyncMemory:
+    return BaseAsyncMemory(
+        llm=llm,
+        business_description="A personal AI assistant",
+        memory_file=str(tmp_path / "memory.json"),
+        update_strategy="consolidated",
+    )
+
+
+def test_consolidated_update_memory_uses_one_llm_call(tmp_path) -> None:
+    llm = ScriptedChatModel()
+    memory = make_consolidated_memory(tmp_path, llm)
+
+    async def run():
+        await memory.update_memory("u", "I live in Paris")
+        assert llm.calls == {"patch": 1}
+        await memory.update_memory("u", "I live in Tokyo")
+        user_memory = await memory._get_user_memory("u")
+        await memory.close()
+        return user_memory
+
+    user_memory = asyncio.run(run())
+    assert llm.calls == {"patch": 2}
+    assert user_memory["location"] == "Tokyo"
+
+
+def test_consolidated_batch_update_memory_uses_one_llm_call(tmp_path) -> None:
+    llm = ScriptedChatModel()
+    memory = make_consolidated_memory(tmp_path, llm)
+    messages = [
+        {"role": "user", "content": "I live in Paris"},
+        {"role": "assistant", "content": "Nice!"},
+        {"role": "user", "content": "I work as a nurse"},
+    ]
+
+    async def run():
+        user_memory = await memory.batch_update_memory("u", messages)
+        await memory.close()
+        return user_memory
+
+    user_memory = asyncio.run(run())
+    assert llm.calls == {"patch": 1}
+    assert user_memory["location"] == "Paris" and user_memory["job"] == "nurse"
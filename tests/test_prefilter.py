@@ -0,0 +1,55 @@
+import asyncio
+
+from benchmarks.fake_llm import SMALL_TALK, ScriptedChatModel
+from memory.memory import BaseAsyncMemory
+from memory.prefilter import MessagePrefilter
+
+
+def test_prefilter_rules_and_classifier() -> None:
+    prefilter = MessagePrefilter()
+    skipped = [m for m in SMALL_TALK if not prefilter.should_extract(m)]
+    assert skipped == ["thanks!", "ok", "haha", "👍", "sounds good"]
+    assert prefilter.should_extract("No, I don't eat meat")
+    assert prefilter.should_extract("ok", "I live in Paris")
+    assert prefilter.stats()["skipped"] == 5
+
+    strict = MessagePrefilter(
+        require_self_reference=True, classifier=lambda m: 0.9 if "live" in m else 0.1
+    )
+    assert not strict.should_extract("Can you help with this?")
+    assert not strict.should_extract("I am bored")
+    assert strict.should_extract("I live in Paris")
+
+
+def test_small_talk_skips_extraction_and_storage(tmp_path) -> None:
+    llm = ScriptedChatModel()
+    memory = BaseAsyncMemory(
+        llm=llm,
+        business_description="A personal AI assistant",
+        include_beliefs=True,
+        memory_file=str(tmp_path / "memory.json"),
+    )
+
+    async def run():
+        first = await memory.update_memory("u", "I live in Paris")
+        calls = llm.total_calls
+        written = memory.storage.bytes_written
+        assert await memory.update_memory("u", "thanks!") is first
+        assert (
+            await memory.batch_update_memory(
+                "u", [{"role": "human", "content": "haha 👍"}]
+            )
+            == first
+        )
+        assert (await memory.update_memory("new", "ok")) == {}
+        assert llm.total_calls == calls
+        assert memory.storage.bytes_written == written
+        assert await memory.storage.get("new") is None
+        await memory.close()
+
+    asyncio.run(run())
+    assert memory.prefilter.stats() == {
+        "checked": 4,
+        "skipped": 3,
+        "skip_ratio": 0.75,
+    }
@@ -0,0 +1,96 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from benchmarks.fake_llm import ScriptedChatModel
+from memory.memory import BaseAsyncMemory
+from memory.retrieval import BaseEmbedder, HashingEmbedder, MemoryIndex
+
+ENTRIES = [
+    "pets: ['dog named Charlie', 'horse named Luna']",
+    "location: Paris",
+    "job: software engineer",
+    "food_preference: sushi",
+]
+
+
+def test_hashing_embedder_is_normalized_and_stable() -> None:
+    vectors = HashingEmbedder().embed(["I have a dog", "", "I have a dog"])
+
+    buckets, weights = vectors[0]
+    assert np.all(np.diff(buckets) > 0)
+    assert np.isclose(np.linalg.norm(weights), 1.0)
+    assert not len(vectors[1][0])
+    assert np.array_equal(buckets, vectors[2][0])
+
+
+def test_memory_index_ranks_and_budgets_entries() -> None:
+    index = MemoryIndex()
+
+    assert index.search("u", ENTRIES, "Any ideas for my dogs?", top_k=1) == [ENTRIES[0]]
+    assert index.search("u", ENTRIES, "where do I live? Paris?")[0] == ENTRIES[1]
+    assert index.search("u", ENTRIES, "dogs in Paris", max_tokens=5) == [ENTRIES[1]]
+    assert index.search("u", [], "dogs") == []
+
+
+def test_memory_index_backfills_unmatched_slots_in_fallback_order() -> None:
+    index = MemoryIndex()
+    fallback = [ENTRIES[3], ENTRIES[1], ENTRIES[0], ENTRIES[2]]
+
+    assert index.search("u", ENTRIES, "What should I cook tonight?") == []
+    assert index.search(
+        "u", ENTRIES, "What should I cook tonight?", top_k=2, fallback=fallback
+    ) == [ENTRIES[3], ENTRIES[1]]
+    assert index.search("u", ENTRIES, "my dogs", top_k=2, fallback=fallback) == [
+        ENTRIES[0],
+        ENTRIES[3],
+    ]
+
+
+def test_base_embedder_requires_embed() -> None:
+    with pytest.raises(TypeError):
+        BaseEmbedder()
+
+
+def test_get_memory_context_uses_local_index_without_llm(tmp_path) -> None:
+    llm = ScriptedChatModel()
+    memory = BaseAsyncMemory(
+        llm=llm,
+        business_description="A personal AI assistant",
+        memory_file=str(tmp_path / "memory.json"),
+        context_top_k=1,
+    )
+
+    async def run():
+        await memory.update_memory("u", "I live in Paris")
+        await memory.update_memory("u", "I work as a teacher")
+        calls = llm.total_calls
+        context = await memory.get_memory_context("u", "Which city am I in, Paris?")
+        assert context == "User Memory:\nlocation: Paris\n"
+        assert llm.total_calls == calls
+
+        memory.context_retrieval = "llm"
+        await memory.get_memory_context("u", "Which city am I in?")
+        assert llm.calls["filter_context"] == 1
+        await memory.close()
+
+    asyncio.run(run())
+
+
+def test_get_memory_context_falls_back_when_nothing_matches(tmp_path) -> None:
+    memory = BaseAsyncMemory(
+        llm=ScriptedChatModel(),
+        business_description="A personal AI assistant",
+        memory_file=str(tmp_path / "memory.json"),
+    )
+
+    async def run():
+        await memory.update_memory("u", "I like eating vegetarian food")
+        context = await memory.get_memory_context(
+            "u", "What should I cook for dinner tonight?"
+        )
+        assert "vegetarian food" in context
+        await memory.close()
+
+    asyncio.run(run())
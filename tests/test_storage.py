@@ -0,0 +1,257 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+
+import pytest
+
+from memory.storage import (
+    IndexedSnapshot,
+    IndexedSnapshotStorage,
+    JSONFileStorage,
+    SQLiteStorage,
+    WriteAheadLog,
+    WriteConflictError,
+)
+from memory.storage.serializers import detect_format
+
+
+@pytest.fixture(params=["snapshot", "log", "sqlite", "indexed"])
+def storage(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteStorage(str(tmp_path / "memory.db"))
+    if request.param == "indexed":
+        return IndexedSnapshotStorage(str(tmp_path / "memory.idx"))
+    return JSONFileStorage(str(tmp_path / "memory.json"), persistence=request.param)
+
+
+def test_storage_round_trip(storage) -> None:
+    async def run():
+        await storage.put("a", {"pet": "dog named Charlie"})
+        await storage.put("b", {"location": "Paris"})
+        await storage.put("b", {"location": "Rome"})
+        assert await storage.delete("a")
+        assert not await storage.delete("missing")
+        result = (await storage.get("a"), await storage.get("b"))
+        users = await storage.list_users()
+        await storage.close()
+        return result, users
+
+    assert asyncio.run(run()) == ((None, {"location": "Rome"}), ["b"])
+
+
+def test_wal_replays_log_over_snapshot(tmp_path) -> None:
+    memory_file = str(tmp_path / "memory.json")
+
+    async def run():
+        wal = WriteAheadLog(memory_file, compaction_threshold=2)
+        memory = await wal.load()
+        for user_id in ("a", "b", "c"):
+            memory[user_id] = {"pet": f"dog of {user_id}"}
+            await wal.append(user_id, memory[user_id])
+        assert wal.needs_compaction()
+        await wal.compact(memory)
+
+        del memory["a"]
+        await wal.append("a", None)
+        return await WriteAheadLog(memory_file).load()
+
+    assert asyncio.run(run()) == {
+        "b": {"pet": "dog of b"},
+        "c": {"pet": "dog of c"},
+    }
+
+
+def test_wal_drops_torn_tail(tmp_path) -> None:
+    memory_file = str(tmp_path / "memory.json")
+
+    async def run():
+        wal = WriteAheadLog(memory_file)
+        await wal.append("a", {"location": "Paris"})
+        with open(wal.log_file, "a") as f:
+            f.write('{"user_id": "b", "rec')
+
+        wal = WriteAheadLog(memory_file)
+        await wal.load()
+        await wal.append("c", {"location": "Rome"})
+        return await WriteAheadLog(memory_file).load()
+
+    assert asyncio.run(run()) == {
+        "a": {"location": "Paris"},
+        "c": {"location": "Rome"},
+    }
+
+
+def test_storage_put_many_writes_and_deletes(storage) -> None:
+    async def run():
+        await storage.put("a", {"pet": "dog named Charlie"})
+        await storage.put_many(
+            {"a": None, "b": {"job": "nurse"}, "c": {"hobby": "chess"}}
+        )
+        result = (await storage.get("a"), await storage.get("b"))
+        users = sorted(await storage.list_users())
+        await storage.close()
+        return result, users
+
+    assert asyncio.run(run()) == ((None, {"job": "nurse"}), ["b", "c"])
+
+
+@pytest.mark.parametrize("serializer", ["json", "orjson", "msgpack"])
+@pytest.mark.parametrize("persistence", ["snapshot", "log"])
+def test_json_file_storage_migrates_between_formats(
+    tmp_path, serializer, persistence
+) -> None:
+    if serializer != "json":
+        pytest.importorskip(serializer)
+    memory_file = tmp_path / "memory.json"
+    memory_file.write_text(json.dumps({"a": {"location": "Paris"}}, indent=2))
+
+    async def run():
+        storage = JSONFileStorage(
+            str(memory_file), persistence=persistence, serializer=serializer
+        )
+        assert await storage.get("a") == {"location": "Paris"}
+        await storage.put("b", {"job": "nurse"})
+        await storage.close()
+        reopened = JSONFileStorage(
+            str(memory_file), persistence=persistence, serializer=serializer
+        )
+        return await reopened.get("b")
+
+    assert asyncio.run(run()) == {"job": "nurse"}
+    content = memory_file.read_bytes()
+    assert detect_format(content) == ("msgpack" if serializer == "msgpack" else "json")
+    if persistence == "snapshot":
+        assert b"\n" not in content
+
+
+def test_sqlite_storage_reads_rows_of_any_format(tmp_path) -> None:
+    pytest.importorskip("msgpack")
+    db_file = str(tmp_path / "memory.db")
+
+    async def run():
+        storage = SQLiteStorage(db_file)
+        await storage.put("a", {"location": "Paris"})
+        await storage.close()
+
+        storage = SQLiteStorage(db_file, serializer="msgpack")
+        await storage.put("b", {"job": "nurse"})
+        result = (await storage.get("a"), await storage.get("b"))
+        await storage.close()
+        return result
+
+    assert asyncio.run(run()) == ({"location": "Paris"}, {"job": "nurse"})
+
+
+def test_sqlite_storage_rejects_writes_based_on_stale_reads(tmp_path) -> None:
+    db_file = str(tmp_path / "memory.db")
+
+    async def run():
+        first, second = SQLiteStorage(db_file), SQLiteStorage(db_file)
+        assert await first.get("u") is None and await second.get("u") is None
+        await first.put("u", {"location": "Paris"})
+        with pytest.raises(WriteConflictError) as conflict:
+            await second.put("u", {"job": "nurse"})
+        assert conflict.value.user_ids == ["u"]
+
+        record = await second.get("u")
+        await second.put("u", {**record, "job": "nurse"})
+        with pytest.raises(WriteConflictError):
+            await first.put_many({"u": {"location": "Rome"}, "v": {"pet": "cat"}})
+        assert await first.get("v") is None
+        result = await first.get("u")
+        await first.close()
+        await second.close()
+        return result
+
+    assert asyncio.run(run()) == {"location": "Paris", "job": "nurse"}
+
+
+def test_sqlite_storage_adds_versions_to_old_databases(tmp_path) -> None:
+    db_file = str(tmp_path / "memory.db")
+    with sqlite3.connect(db_file) as conn:
+        conn.execute("CREATE TABLE memory (user_id TEXT PRIMARY KEY, record TEXT)")
+        conn.execute("INSERT INTO memory VALUES ('u', '{\"location\": \"Paris\"}')")
+    conn.close()
+
+    async def run():
+        storage = SQLiteStorage(db_file)
+        record = await storage.get("u")
+        await storage.put("u", {**record, "job": "nurse"})
+        result = await storage.get("u")
+        await storage.close()
+        return result
+
+    assert asyncio.run(run()) == {"location": "Paris", "job": "nurse"}
+
+
+def test_indexed_snapshot_storage_layers_log_over_snapshot(tmp_path) -> None:
+    snapshot_file = str(tmp_path / "memory.idx")
+
+    async def run():
+        source = JSONFileStorage(str(tmp_path / "memory.json"))
+        for i in range(50):
+            await source.put(f"user-{i}", {"n": i})
+        storage = IndexedSnapshotStorage(snapshot_file, compaction_threshold=10)
+        await storage.import_from(source)
+
+        await storage.put("user-1", {"n": "changed"})
+        assert await storage.delete("user-2")
+        assert not await storage.delete("user-2")
+        await storage.close()
+
+        storage = IndexedSnapshotStorage(snapshot_file, compaction_threshold=10)
+        assert await storage.get("user-1") == {"n": "changed"}
+        assert await storage.get("user-2") is None
+        for i in range(3, 12):
+            await storage.put(f"new-{i}", {"n": i})
+        await storage.wait_for_background_tasks()
+        snapshot = IndexedSnapshot(snapshot_file)
+        users = sorted(await storage.list_users())
+        result = (
+            len(snapshot),
+            snapshot.get("user-1"),
+            snapshot.get("user-49"),
+            "user-2" in snapshot,
+            await storage.get("new-11"),
+        )
+        snapshot.close()
+        await storage.close()
+        return users, result
+
+    users, result = asyncio.run(run())
+    assert len(users) == 58 and "user-2" not in users
+    assert result == (58, {"n": "changed"}, {"n": 49}, False, {"n": 11})
+
+
+def test_json_snapshot_syncs_off_the_event_loop_on_flush_only(
+    tmp_path, monkeypatch
+) -> None:
+    synced_from = []
+    fsync = os.fsync
+
+    def tracking_fsync(fd):
+        synced_from.append(threading.current_thread())
+        fsync(fd)
+
+    monkeypatch.setattr(os, "fsync", tracking_fsync)
+    memory_file = str(tmp_path / "memory.json")
+
+    async def run():
+        storage = JSONFileStorage(memory_file)
+        for i in range(5):
+            await storage.put(f"user-{i}", {"n": i})
+        assert synced_from == []
+        await storage.put_many({"user-0": None, "user-5": {"n": 5}})
+        assert len(synced_from) == 1
+        await storage.put("user-6", {"n": 6})
+        await storage.close()
+        assert len(synced_from) == 2
+        await storage.close()
+        assert len(synced_from) == 2
+
+    asyncio.run(run())
+    assert threading.main_thread() not in synced_from
+    with open(memory_file) as f:
+        assert sorted(json.load(f)) == [f"user-{i}" for i in range(1, 7)]
@@ -0,0 +1,30 @@
+import asyncio
+
+from benchmarks.fake_llm import ScriptedChatModel
+from memory.memory import BaseAsyncMemory
+
+
+def test_views_are_reused_until_the_user_changes(tmp_path) -> None:
+    memory = BaseAsyncMemory(
+        llm=ScriptedChatModel(),
+        business_description="A personal AI assistant",
+        memory_file=str(tmp_path / "memory.json"),
+    )
+
+    async def run():
+        await memory.update_memory("u", "I live in Paris")
+        rendered = await memory.get_memory("u")
+        context = await memory.get_memory_context("u")
+        assert await memory.get_memory("u") is rendered
+        assert await memory.get_memory_context("u") is context
+        assert context == "User Memory:\nlocation: Paris\n"
+
+        await memory.update_memory("u", "I work as a nurse")
+        assert "nurse" in await memory.get_memory("u")
+        assert "job: nurse" in await memory.get_memory_context("u")
+
+        await memory.delete_memory("u")
+        assert await memory.get_memory("u") is None
+        await memory.close()
+
+    asyncio.run(run())